@@ -0,0 +1,209 @@
+import importlib
+import json
+import logging
+import multiprocessing
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ml_project.benchmarks.synthetic_corpus import SyntheticCorpus
+from ml_project.logging.profiler import peak_rss_mb
+
+
+def _praat_vowels(corpus: SyntheticCorpus) -> int:
+    from ml_project.components.preprocessing.praat_feature_extractor import PraatFeatureExtractor
+    from ml_project.config.params import VowelConfig
+
+    extractor = PraatFeatureExtractor(features_template=VowelConfig.features_template)
+    files = sorted(corpus.vowel_dir.rglob("*.wav"))
+    for file in files:
+        extractor.extract_features(file, label=file.parent.name)
+    return len(files)
+
+
+def _praat_vowels_pitch(corpus: SyntheticCorpus) -> int:
+    from ml_project.components.preprocessing.praat_feature_extractor import PraatFeatureExtractor
+
+    # Only the pitch feature group, as in a quick F0 sweep
+    extractor = PraatFeatureExtractor(features_template={"f0_mean": np.nan})
+    files = sorted(corpus.vowel_dir.rglob("*.wav"))
+    for file in files:
+        extractor.extract_features(file, label=file.parent.name)
+    return len(files)
+
+
+def _opensmile_vowels(corpus: SyntheticCorpus) -> int:
+    from ml_project.components.preprocessing.opensmile_feature_extractor import OpenSmileFeatureExtractor
+
+    extractor = OpenSmileFeatureExtractor(num_workers=multiprocessing.cpu_count())
+    files = sorted(corpus.vowel_dir.rglob("*.wav"))
+    extractor.extract_batch([(file, file.parent.name) for file in files])
+    return len(files)
+
+
+def _librosa_sentences(corpus: SyntheticCorpus) -> int:
+    from ml_project.components.preprocessing.librosa_feature_extractor import LibrosaFeatureExtractor
+
+    extractor = LibrosaFeatureExtractor(str(corpus.participant_path), sample_rate=corpus.config.sample_rate)
+    # The default 10-8000 Hz search range is rejected by recent librosa pitch trackers
+    extractor.fmin, extractor.fmax = 75, 600
+    return len(extractor.prepare_data(corpus.sentence_dir))
+
+
+def _vowel_dataset(corpus: SyntheticCorpus) -> int:
+    from ml_project.components.preprocessing.praat_feature_extractor import PraatFeatureExtractor
+    from ml_project.components.preprocessing.vowel_dataset_creator import VowelDatasetCreator
+    from ml_project.config.params import VowelConfig
+
+    extractor = PraatFeatureExtractor(exclude_segments=True, features_template=VowelConfig.features_template)
+    creator = VowelDatasetCreator(extractor, corpus.eval_path, corpus.participant_path, corpus.root / "output")
+    return len(_check_joined(creator.create_dataset(corpus.vowel_dir), "vowel_dataset"))
+
+
+def _sentence_dataset(corpus: SyntheticCorpus) -> int:
+    from ml_project.components.preprocessing.praat_feature_extractor import PraatFeatureExtractor
+    from ml_project.components.preprocessing.sentence_dataset_creator import SentenceDatasetCreator
+    from ml_project.config.params import SentenceConfig
+
+    extractor = PraatFeatureExtractor(exclude_segments=True, features_template=SentenceConfig.features_template)
+    creator = SentenceDatasetCreator(extractor, corpus.eval_path, corpus.participant_path, corpus.root / "output")
+    return len(_check_joined(creator.create_dataset(corpus.sentence_dir), "sentence_dataset"))
+
+
+def _check_joined(df: pd.DataFrame, stage: str) -> pd.DataFrame:
+    """Raise if a recording of the dataset was not matched with its evaluation and participant data"""
+    for column in ("voiceattractiveness", "age_category"):
+        missing = int(df[column].isna().sum()) if column in df.columns else len(df)
+        if df.empty or missing:
+            raise ValueError(f"{stage}: {column} is missing for {missing} of {len(df)} rows, "
+                             f"the recordings were not joined with the corpus metadata")
+    return df
+
+
+def _training(corpus: SyntheticCorpus) -> int:
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    from ml_project.components.models.logreg_trainer import LogisticRegressionTrainer
+
+    # Feature table the size of a large dataset: 7 acoustic features per recording
+    n_samples = 100 * corpus.config.n_speakers
+    rng = np.random.default_rng(corpus.config.seed)
+    y = rng.integers(0, 2, n_samples)
+    X = pd.DataFrame(rng.standard_normal((n_samples, 7)) + y[:, None] * 0.5,
+                     columns=[f"feature_{i}" for i in range(7)])
+    trainer = LogisticRegressionTrainer(
+        pipeline_steps=[("scaler", StandardScaler()), ("logreg", LogisticRegression(max_iter=1000))],
+        param_grid={"logreg__C": list(np.logspace(-3, 3, 10))}
+    )
+    trainer.train(X, y)
+    return n_samples
+
+
+# Stage name -> function running it on a corpus and returning the number of items (files or samples) processed
+STAGES: Dict[str, Callable[[SyntheticCorpus], int]] = {
+    "praat_vowels": _praat_vowels,
+    "praat_vowels_pitch": _praat_vowels_pitch,
+    "opensmile_vowels": _opensmile_vowels,
+    "librosa_sentences": _librosa_sentences,
+    "vowel_dataset": _vowel_dataset,
+    "sentence_dataset": _sentence_dataset,
+    "training": _training,
+}
+
+# Stage name -> modules the stage imports, loaded before its timer starts
+STAGE_IMPORTS: Dict[str, List[str]] = {
+    "praat_vowels": ["ml_project.components.preprocessing.praat_feature_extractor"],
+    "praat_vowels_pitch": ["ml_project.components.preprocessing.praat_feature_extractor"],
+    "opensmile_vowels": ["ml_project.components.preprocessing.opensmile_feature_extractor"],
+    "librosa_sentences": ["ml_project.components.preprocessing.librosa_feature_extractor"],
+    "vowel_dataset": ["ml_project.components.preprocessing.praat_feature_extractor",
+                      "ml_project.components.preprocessing.vowel_dataset_creator"],
+    "sentence_dataset": ["ml_project.components.preprocessing.praat_feature_extractor",
+                         "ml_project.components.preprocessing.sentence_dataset_creator"],
+    "training": ["ml_project.components.models.logreg_trainer"],
+}
+
+
+def _run_stage_in_process(stage: str, corpus: SyntheticCorpus) -> Dict:
+    # Imported before timing, so a stage is not charged for loading its libraries in the fresh process
+    for module in STAGE_IMPORTS[stage]:
+        importlib.import_module(module)
+    start = time.perf_counter()
+    items = STAGES[stage](corpus)
+    wall_time = time.perf_counter() - start
+    return {"items": items, "wall_time_s": wall_time, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_stage(stage: str, corpus: SyntheticCorpus, repeat: int = 3) -> Dict:
+    """Time a stage in a fresh process per repetition, so its peak RSS is not inflated by other stages
+
+    Returns:
+        Dict: Items processed, median wall time, items per second and the highest peak RSS (MB)
+    """
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            runs.append(pool.submit(_run_stage_in_process, stage, corpus).result())
+    wall_time = statistics.median(run["wall_time_s"] for run in runs)
+    return {
+        "items": runs[0]["items"],
+        "wall_time_s": wall_time,
+        "items_per_s": runs[0]["items"] / wall_time,
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+    }
+
+
+def run_benchmarks(corpus: SyntheticCorpus, stages: Optional[List[str]] = None, repeat: int = 3) -> Dict:
+    """Run the benchmark stages on a corpus
+
+    Returns:
+        Dict: Corpus config and the results of every stage, in the format of a baseline file
+    """
+    results = {"corpus": asdict(corpus.config), "stages": {}}
+    for stage in stages or list(STAGES):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown benchmark stage: {stage}")
+        logging.info(f"Running benchmark stage {stage}")
+        results["stages"][stage] = run_stage(stage, corpus, repeat)
+    return results
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, threshold: float = 0.2) -> List[str]:
+    """Regressions of the results against a baseline run on the same corpus
+
+    A stage regresses if its throughput drops or its peak RSS grows by more than threshold.
+
+    Returns:
+        List[str]: Description of every regression, empty if there is none
+    """
+    if results["corpus"] != baseline["corpus"]:
+        raise ValueError(f"Baseline corpus {baseline['corpus']} differs from the benchmarked one {results['corpus']}")
+    regressions = []
+    for stage, result in results["stages"].items():
+        reference = baseline["stages"].get(stage)
+        if reference is None:
+            continue
+        if result["items_per_s"] < reference["items_per_s"] * (1 - threshold):
+            regressions.append(f"{stage}: {result['items_per_s']:.2f} items/s, "
+                               f"baseline {reference['items_per_s']:.2f} items/s")
+        if result["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{stage}: peak RSS {result['peak_rss_mb']:.0f} MB, "
+                               f"baseline {reference['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def load_baseline(path: Path) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
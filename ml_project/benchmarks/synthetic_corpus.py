@@ -0,0 +1,131 @@
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import soundfile as sf
+
+
+@dataclass
+class CorpusConfig:
+    n_speakers: int = 20
+    vowel_duration: float = 2.0  # seconds of sustained vowel per speaker
+    sentence_duration: float = 4.0  # seconds of connected speech per speaker
+    sample_rate: int = 16000
+    seed: int = 0
+
+
+@dataclass
+class SyntheticCorpus:
+    """Paths of a generated corpus, laid out like the real data the pipelines read"""
+    root: Path
+    config: CorpusConfig
+
+    @property
+    def vowel_dir(self) -> Path:
+        return self.root / "vowels"
+
+    @property
+    def sentence_dir(self) -> Path:
+        return self.root / "sentences"
+
+    @property
+    def eval_path(self) -> Path:
+        return self.root / "DATA_GEFAV_EVAL.CSV"
+
+    @property
+    def participant_path(self) -> Path:
+        return self.root / "participant_information.csv"
+
+
+# Version of the file layout, so a corpus written with an older layout is generated again
+_LAYOUT_VERSION = 2
+
+
+def _corpus_state(config: CorpusConfig) -> dict:
+    return {"layout": _LAYOUT_VERSION, **asdict(config)}
+
+
+def _voice(rng: np.random.Generator, f0: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Harmonic voice source following the f0 contour, with jitter, shimmer and breath noise"""
+    f0 = f0 * (1 + 0.01 * rng.standard_normal(len(f0)).cumsum() / np.sqrt(np.arange(1, len(f0) + 1)))
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    y = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 1 + 0.05 * np.sin(2 * np.pi * 4 * np.arange(len(f0)) / sample_rate)
+    return 0.2 * y * envelope + 0.005 * rng.standard_normal(len(f0))
+
+
+def _vowel(rng: np.random.Generator, base_f0: float, duration: float, sample_rate: int) -> np.ndarray:
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    return _voice(rng, base_f0 * (1 + 0.02 * np.sin(2 * np.pi * 5 * t)), sample_rate)
+
+
+def _sentence(rng: np.random.Generator, base_f0: float, duration: float, sample_rate: int) -> np.ndarray:
+    """Voiced syllables with a falling intonation, separated by short pauses"""
+    n = int(duration * sample_rate)
+    y = np.zeros(n)
+    position = 0
+    while position < n:
+        syllable = int(rng.uniform(0.12, 0.3) * sample_rate)
+        end = min(position + syllable, n)
+        declination = 1.1 - 0.25 * position / n
+        f0 = base_f0 * declination * (1 + 0.08 * np.sin(np.linspace(0, np.pi, end - position)))
+        y[position:end] = _voice(rng, f0, sample_rate) * np.hanning(end - position)
+        position = end + int(rng.uniform(0.03, 0.12) * sample_rate)
+    return y + 0.002 * rng.standard_normal(n)
+
+
+def generate_corpus(root: Path, config: CorpusConfig = CorpusConfig()) -> SyntheticCorpus:
+    """Write a reproducible corpus of synthetic vowel and sentence recordings with matching metadata
+
+    Every speaker gets one sustained vowel (<vowel_dir>/<speaker>/<speaker>_VoiceVowel.wav), one
+    sentence (<sentence_dir>/<speaker>_VoiceSentence2(Hour).wav), one row of evaluation data and one
+    row of participant information. An existing corpus generated with the same config is reused.
+
+    Args:
+        root (Path): Directory of the corpus
+        config (CorpusConfig): Size and seed of the corpus
+
+    Returns:
+        SyntheticCorpus: Paths of the corpus
+    """
+    corpus = SyntheticCorpus(Path(root), config)
+    config_path = corpus.root / "corpus.json"
+    if config_path.exists() and json.loads(config_path.read_text()) == _corpus_state(config):
+        return corpus
+
+    # Recordings of a previous corpus in the directory would be read along with the new ones
+    for stale in [*corpus.vowel_dir.rglob("*.wav"), *corpus.sentence_dir.glob("*.wav")]:
+        stale.unlink()
+    rng = np.random.default_rng(config.seed)
+    corpus.sentence_dir.mkdir(parents=True, exist_ok=True)
+    evaluations, participants = [], []
+    for i in range(1, config.n_speakers + 1):
+        sex = "F" if i % 2 else "M"
+        speaker = f"{sex}-{i}"
+        base_f0 = rng.uniform(170, 250) if sex == "F" else rng.uniform(95, 140)
+        speaker_dir = corpus.vowel_dir / speaker
+        speaker_dir.mkdir(parents=True, exist_ok=True)
+        sf.write(speaker_dir / f"{speaker}_VoiceVowel.wav",
+                 _vowel(rng, base_f0, config.vowel_duration, config.sample_rate).astype(np.float32),
+                 config.sample_rate)
+        sf.write(corpus.sentence_dir / f"{speaker}_VoiceSentence2(Hour).wav",
+                 _sentence(rng, base_f0, config.sentence_duration, config.sample_rate).astype(np.float32),
+                 config.sample_rate)
+
+        age = int(rng.integers(18, 80))
+        evaluations.append({
+            "SEX": "FO" if sex == "F" else "H", "DONOR": i, "stimulussex": sex,
+            "FaceAttractiveness": rng.uniform(1, 7), "VideoAttractiveness": rng.uniform(1, 7),
+            "VoiceAttractiveness": rng.uniform(1, 7), "Age_category": "young" if age < 40 else "old",
+        })
+        participants.append({
+            "Participant": speaker, "Age": age, "Sex": sex, "CollectionDate": "2024-01-01",
+            "Experimenter": "synthetic", "RESTRICTION OF USE": "none",
+        })
+
+    pd.DataFrame(evaluations).to_csv(corpus.eval_path, sep="\t", index=False)
+    pd.DataFrame(participants).to_csv(corpus.participant_path, index=False)
+    config_path.write_text(json.dumps(_corpus_state(config)))
+    return corpus
@@ -1,19 +1,151 @@
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
 import pandas as pd
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import GridSearchCV
-from src.interfaces import ModelTrainer
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, RandomizedSearchCV
+from ml_project.components.models.regularization_path import RegularizationPathSearchCV
+from ml_project.components.models.transformer_cache import TransformerCache
+from ml_project.src.interfaces import ModelTrainer
+
+SEARCH_STRATEGIES = ("grid", "parallel_grid", "halving", "random", "regularization_path")
+
 
 class LogisticRegressionTrainer(ModelTrainer):
-    def __init__(self, pipeline_steps: list, param_grid: dict):
-        self.pipeline = Pipeline(pipeline_steps)
+    def __init__(self, pipeline_steps: list, param_grid: dict,
+                 search_strategy: str = "grid",
+                 cv: int = 4,
+                 n_jobs: int = -1,
+                 n_iter: int = 10,
+                 halving_factor: int = 3,
+                 random_state: Optional[int] = 0,
+                 transformer_cache: Optional[TransformerCache] = None):
+        """Trainer searching the hyperparameters of a logistic regression pipeline
+
+        Args:
+            pipeline_steps (list): Steps of the pipeline, the last one being the classifier
+            param_grid (dict): Hyperparameter grid
+            search_strategy (str): One of SEARCH_STRATEGIES. "grid" is the exhaustive serial search,
+                "parallel_grid" the same search on n_jobs processes, "halving" successive halving,
+                "random" n_iter randomly sampled grid points and "regularization_path" a warm-started
+                pass over the C grid per fold
+            cv (int): Number of cross-validation folds
+            n_jobs (int): Processes used by every strategy except "grid" and "regularization_path"
+            n_iter (int): Budget of the "random" strategy
+            halving_factor (int): Fraction of candidates kept (1 / factor) at each "halving" iteration
+            random_state (Optional[int]): Seed of the "random" and "halving" strategies
+            transformer_cache (Optional[TransformerCache]): Cache of the fitted transformer steps, reused
+                across grid points. Not used by "regularization_path", which fits them once per fold anyway
+        """
+        if search_strategy not in SEARCH_STRATEGIES:
+            raise ValueError(f"Unknown search strategy: {search_strategy}")
+        if search_strategy == "regularization_path" and transformer_cache:
+            logging.info("The regularization path search fits the transformers once per fold, not caching them")
+            transformer_cache = None
+        self.transformer_cache = transformer_cache
+        self.pipeline = Pipeline(pipeline_steps, memory=transformer_cache.memory if transformer_cache else None)
         self.param_grid = param_grid
-        
+        self.search_strategy = search_strategy
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.n_iter = n_iter
+        self.halving_factor = halving_factor
+        self.random_state = random_state
+        self.search_report: Dict = {}
+
     def train(self, X_train: pd.DataFrame, y_train: np.ndarray) -> GridSearchCV:
-        grid_cv = GridSearchCV(
+        search = self._build_search()
+        entries_before = self.transformer_cache.entries() if self.transformer_cache else 0
+        start = time.perf_counter()
+        try:
+            search.fit(X_train, y_train)
+        finally:
+            wall_time = time.perf_counter() - start
+            if self.transformer_cache:
+                cache_stats = self.transformer_cache.stats(self._transformer_fits(search), entries_before)
+                self.transformer_cache.finalize()
+        self.search_report = {
+            "search_strategy": self.search_strategy,
+            "search_wall_time_s": wall_time,
+            "best_score": search.best_score_,
+            "n_candidates": len(search.cv_results_["params"]),
+        }
+        if self.transformer_cache:
+            # The fitted model must not reference the (possibly removed) cache once it is saved
+            if hasattr(search, "best_estimator_"):
+                search.best_estimator_.set_params(memory=None)
+            self.search_report.update(cache_stats)
+            logging.info(f"Transformer fits served from cache: {cache_stats['transformer_fits_cached']} "
+                         f"of {cache_stats['transformer_fits_requested']}")
+        logging.info(
+            f"{self.search_strategy} search: best score {search.best_score_:.4f} "
+            f"in {self.search_report['search_wall_time_s']:.2f}s ({self.search_report['n_candidates']} candidates)"
+        )
+        return search
+
+    def _transformer_fits(self, search) -> int:
+        """Transformer fits requested by a search: every step but the last, per fold and candidate, plus the refit"""
+        if not hasattr(search, "cv_results_"):
+            return 0
+        n_pipeline_fits = len(search.cv_results_["params"]) * search.n_splits_ + 1
+        return n_pipeline_fits * (len(self.pipeline.steps) - 1)
+
+    def _build_search(self):
+        if self.search_strategy == "regularization_path":
+            return RegularizationPathSearchCV(self.pipeline, self.param_grid, cv=self.cv, return_train_score=True)
+        if self.search_strategy == "halving":
+            return HalvingGridSearchCV(
+                self.pipeline,
+                self.param_grid,
+                cv=self.cv,
+                factor=self.halving_factor,
+                n_jobs=self.n_jobs,
+                return_train_score=True,
+                random_state=self.random_state,
+                verbose=1
+            )
+        if self.search_strategy == "random":
+            return RandomizedSearchCV(
+                self.pipeline,
+                self.param_grid,
+                n_iter=self.n_iter,
+                cv=self.cv,
+                n_jobs=self.n_jobs,
+                return_train_score=True,
+                random_state=self.random_state,
+                verbose=1
+            )
+        return GridSearchCV(
             self.pipeline,
             self.param_grid,
-            cv=4,
+            cv=self.cv,
+            n_jobs=self.n_jobs if self.search_strategy == "parallel_grid" else None,
             return_train_score=True,
             verbose=1
         )
-        return grid_cv.fit(X_train, y_train)
+
+
+def compare_search_strategies(pipeline_steps: list, param_grid: dict, X_train: pd.DataFrame, y_train: np.ndarray,
+                              strategies: List[str] = SEARCH_STRATEGIES, **trainer_kwargs) -> pd.DataFrame:
+    """Run the same search with several strategies and report their wall time and best result
+
+    Args:
+        pipeline_steps (list): Steps of the pipeline, the last one being the classifier
+        param_grid (dict): Hyperparameter grid
+        X_train (pd.DataFrame): Training features
+        y_train (np.ndarray): Training targets
+        strategies (List[str]): Strategies to compare
+        **trainer_kwargs: Other LogisticRegressionTrainer arguments
+
+    Returns:
+        pd.DataFrame: One row per strategy with its wall time, best score and best parameters
+    """
+    rows = []
+    for strategy in strategies:
+        trainer = LogisticRegressionTrainer(pipeline_steps, param_grid, search_strategy=strategy, **trainer_kwargs)
+        search = trainer.train(X_train, y_train)
+        rows.append({**trainer.search_report, "best_params": search.best_params_})
+    return pd.DataFrame(rows)
@@ -0,0 +1,105 @@
+from typing import Dict, List
+
+import numpy as np
+from scipy.stats import rankdata
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.utils import _safe_indexing
+
+
+class RegularizationPathSearchCV:
+    """Cross-validated search over the C grid of a pipeline's final estimator along its regularization path.
+
+    For every fold (and every combination of the other grid parameters) the
+    preprocessing steps are fitted once and the final estimator is fitted with
+    ``warm_start=True`` from the strongest to the weakest regularization, so
+    each C starts from the coefficients of the previous one instead of from
+    scratch. Exposes the same results as GridSearchCV (``cv_results_``,
+    ``best_params_``, ``best_score_``, ``best_estimator_``).
+    """
+
+    def __init__(self, pipeline: Pipeline, param_grid: Dict, cv: int = 4, return_train_score: bool = True):
+        self.pipeline = pipeline
+        self.param_grid = param_grid
+        self.cv = cv
+        self.return_train_score = return_train_score
+        self.c_param = self._find_c_param()
+
+    def _find_c_param(self) -> str:
+        final_step = self.pipeline.steps[-1][0]
+        c_param = f"{final_step}__C"
+        if c_param not in self.param_grid:
+            raise ValueError(f"The regularization path search needs a {c_param} grid")
+        return c_param
+
+    def fit(self, X, y) -> "RegularizationPathSearchCV":
+        Cs = sorted(self.param_grid[self.c_param])
+        other_grid = ParameterGrid({k: v for k, v in self.param_grid.items() if k != self.c_param})
+        folds = list(StratifiedKFold(self.cv).split(X, y))
+        y = np.asarray(y)
+
+        scores = {}
+        for other_params in other_grid:
+            fold_test, fold_train = [], []
+            for train_idx, test_idx in folds:
+                test, train = self._fit_path(other_params, Cs,
+                                             _safe_indexing(X, train_idx), y[train_idx],
+                                             _safe_indexing(X, test_idx), y[test_idx])
+                fold_test.append(test)
+                fold_train.append(train)
+            for i, C in enumerate(Cs):
+                key = self._candidate_key({**other_params, self.c_param: C})
+                scores[key] = ([fold[i] for fold in fold_test], [fold[i] for fold in fold_train])
+
+        # Candidates in GridSearchCV order, so ties are broken the same way
+        params = list(ParameterGrid(self.param_grid))
+        test_scores = np.array([scores[self._candidate_key(p)][0] for p in params])
+        train_scores = np.array([scores[self._candidate_key(p)][1] for p in params])
+
+        self.cv_results_ = self._cv_results(params, test_scores, train_scores)
+        self.best_index_ = int(np.argmin(self.cv_results_["rank_test_score"]))
+        self.best_params_ = params[self.best_index_]
+        self.best_score_ = self.cv_results_["mean_test_score"][self.best_index_]
+        self.best_estimator_ = clone(self.pipeline).set_params(**self.best_params_).fit(X, y)
+        return self
+
+    @staticmethod
+    def _candidate_key(params: Dict) -> tuple:
+        return tuple(sorted((name, repr(value)) for name, value in params.items()))
+
+    def _fit_path(self, other_params: Dict, Cs: List[float], X_train, y_train, X_test, y_test):
+        pipeline = clone(self.pipeline).set_params(**other_params)
+        if len(pipeline) > 1:
+            X_train = pipeline[:-1].fit_transform(X_train, y_train)
+            X_test = pipeline[:-1].transform(X_test)
+        estimator = pipeline[-1].set_params(warm_start=True)
+
+        test_scores, train_scores = [], []
+        for C in Cs:
+            estimator.set_params(C=C).fit(X_train, y_train)
+            test_scores.append(estimator.score(X_test, y_test))
+            train_scores.append(estimator.score(X_train, y_train))
+        return test_scores, train_scores
+
+    def _cv_results(self, params: List[Dict], test_scores: np.ndarray, train_scores: np.ndarray) -> Dict:
+        results = {"params": params}
+        for name in self.param_grid:
+            results[f"param_{name}"] = np.array([p[name] for p in params], dtype=object)
+        for split in range(test_scores.shape[1]):
+            results[f"split{split}_test_score"] = test_scores[:, split]
+        results["mean_test_score"] = test_scores.mean(axis=1)
+        results["std_test_score"] = test_scores.std(axis=1)
+        results["rank_test_score"] = rankdata(-results["mean_test_score"], method="min").astype(np.int32)
+        if self.return_train_score:
+            for split in range(train_scores.shape[1]):
+                results[f"split{split}_train_score"] = train_scores[:, split]
+            results["mean_train_score"] = train_scores.mean(axis=1)
+            results["std_train_score"] = train_scores.std(axis=1)
+        return results
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)
+
+    def score(self, X, y) -> float:
+        return self.best_estimator_.score(X, y)
@@ -0,0 +1,43 @@
+import logging
+from pathlib import Path
+from typing import Dict
+
+from joblib import Memory
+
+
+class TransformerCache:
+    """Disk cache of the fitted transformer steps of a Pipeline, shared by every fit of a search.
+
+    Passed as ``Pipeline(memory=...)``, it makes grid points that only differ in
+    the final estimator's parameters reuse the transformers fitted on the same
+    fold instead of refitting them. Each computed fit adds one entry on disk, so
+    comparing the entries created during a search with the fits it requested
+    gives the number of fits served from the cache.
+    """
+
+    def __init__(self, cache_dir: Path, max_size_mb: int = 1024, cleanup: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_mb * 1024 ** 2
+        self.cleanup = cleanup
+        self.memory = Memory(self.cache_dir, verbose=0)
+
+    def entries(self) -> int:
+        """Number of cached transformer fits on disk"""
+        return sum(1 for _ in self.cache_dir.rglob("output.pkl"))
+
+    def stats(self, fits_requested: int, entries_before: int) -> Dict[str, int]:
+        """Transformer fits requested by a search, computed during it and served from the cache"""
+        fits_computed = self.entries() - entries_before
+        return {
+            "transformer_fits_requested": fits_requested,
+            "transformer_fits_computed": fits_computed,
+            "transformer_fits_cached": max(fits_requested - fits_computed, 0),
+        }
+
+    def finalize(self):
+        """Remove the cache, or shrink it to the size limit if it is kept for later runs"""
+        if self.cleanup:
+            self.memory.clear(warn=False)
+        else:
+            self.memory.reduce_size(bytes_limit=self.max_size_bytes)
+        logging.info(f"Transformer cache {self.cache_dir} {'removed' if self.cleanup else 'kept'}")
@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from src.interfaces import DataPreprocessor
+from ml_project.src.interfaces import DataPreprocessor
 
 class AgePredictionPreprocessor(DataPreprocessor):
     def __init__(self, target_column: str = "Age_category"):
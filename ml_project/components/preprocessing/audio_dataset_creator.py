@@ -0,0 +1,230 @@
+import logging
+from pathlib import Path
+import pandas as pd
+
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+
+from ml_project.components.preprocessing.audio_store import AudioStore
+from ml_project.components.preprocessing.contour_store import CONTOURS_KEY, ContourStoreWriter
+from ml_project.components.preprocessing.corpus_manifest import CorpusManifest
+from ml_project.components.preprocessing.dataset_io import StreamingDatasetWriter, file_state
+from ml_project.components.preprocessing.extraction_executor import ExtractionExecutor
+from ml_project.components.preprocessing.feature_cache import FeatureCache
+from ml_project.components.preprocessing.participant_metadata import ParticipantMetadata
+from ml_project.components.preprocessing.segment_boundaries import SEGMENTS_KEY
+from ml_project.logging.profiler import StageProfiler
+from ml_project.src.interfaces import DatasetCreator, FeatureExtractor
+
+
+class AudioDatasetCreator(DatasetCreator):
+    """Dataset of the features of a corpus of recordings, joined with the evaluation and participant data.
+
+    Runs the extraction (workers, cache, time budgets), incremental rebuilds and
+    streaming the same way for every corpus. Subclasses only define how the
+    recordings are found (``_collect_audio_files``, ``_is_valid_file``), how a
+    file name maps to its sample name (``_sample_name``) and the participant
+    column the rows are joined on (``participant_on``).
+    """
+
+    # Column of the extracted rows matched against the participant data
+    participant_on = 'sample_name'
+
+    def __init__(self,
+                 feature_extractor: FeatureExtractor,
+                 eval_path: Path,
+                 participant_path: Path,
+                 output_dir: Path,
+                 workers: int = 1,
+                 cache: Optional[FeatureCache] = None,
+                 metadata: Optional[ParticipantMetadata] = None,
+                 profiler: Optional[StageProfiler] = None,
+                 contour_writer: Optional[ContourStoreWriter] = None,
+                 manifest: Optional[CorpusManifest] = None,
+                 audio_store: Optional[AudioStore] = None,
+                 longest_first: bool = False,
+                 time_budget: Optional[float] = None,
+                 timeout_retries: int = 1):
+        self.feature_extractor = feature_extractor
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.executor = ExtractionExecutor(feature_extractor, workers=workers, cache=cache, profiler=self.profiler,
+                                           longest_first=longest_first, time_budget=time_budget,
+                                           retries=timeout_retries)
+        self.eval_path = eval_path
+        self.participant_path = participant_path
+        self.metadata = metadata or ParticipantMetadata(eval_path, participant_path)
+        # Receives the frame-level contours of an extractor with keep_contours set
+        self.contour_writer = contour_writer
+        # Cached listing of base_dir, refreshed from directory mtimes instead of walking it on every run
+        self.manifest = manifest
+        # Store the recordings are decoded into before extraction. The extractor must
+        # be given the same store to read views of it instead of decoding the files.
+        self.audio_store = audio_store
+        self.output_dir = output_dir
+        self.files: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def extraction_params(self) -> Dict:
+        """Parameters the rows depend on besides the audio files, stored with the file state of a dataset
+
+        Covers the extractor (backend) and its analysis parameters, e.g. the
+        features template, pitch engine and segment boundaries.
+        """
+        return {**self.executor.analysis_params, "exclude_segments": self.feature_extractor.exclude_segments}
+
+    def create_dataset(self, base_dir: Path) -> pd.DataFrame:
+        tasks = self._discover(base_dir)
+        self._decode_audio(tasks)
+        with self.profiler.stage("dataset.extract"):
+            raw_data = list(self._rows(self.executor.map(tasks)))
+        return self._build_dataset(raw_data)
+
+    def update_dataset(self, base_dir: Path, previous: pd.DataFrame,
+                       previous_files: Dict[str, Dict[str, int]]) -> pd.DataFrame:
+        """Rebuild a previous dataset extracting features only for new or changed recordings
+
+        Args:
+            base_dir (Path): Directory with the audio files
+            previous (pd.DataFrame): Dataset produced by a previous run
+            previous_files (Dict[str, Dict[str, int]]): File state the previous dataset was built from
+
+        Returns:
+            pd.DataFrame: Dataset for the current audio files
+        """
+        tasks = self._discover(base_dir)
+        changed = [(path, label) for path, label in tasks if previous_files.get(str(path)) != self.files[str(path)]]
+        unchanged = {path.name for path, _ in tasks if previous_files.get(str(path)) == self.files[str(path)]}
+        logging.info(f"Incremental rebuild: {len(changed)} new or changed files, {len(unchanged)} unchanged")
+
+        parts = [previous[previous['file'].isin(unchanged)]]
+        if changed:
+            self._decode_audio(changed)
+            with self.profiler.stage("dataset.extract"):
+                raw_data = list(self._rows(self.executor.map(changed)))
+            parts.append(self._build_dataset(raw_data))
+        df = pd.concat(parts, ignore_index=True)
+        order = {path.name: i for i, (path, _) in enumerate(tasks)}
+        return df.sort_values('file', key=lambda files: files.map(order), kind='stable').reset_index(drop=True)
+
+    def stream_dataset(self, base_dir: Path, writer: StreamingDatasetWriter) -> int:
+        """Build the dataset while extracting, appending it to the writer in fixed-size batches
+
+        Each extracted row is joined with the evaluation and participant data through
+        the indexed metadata, so only the current batch is ever held in memory.
+
+        Args:
+            base_dir (Path): Directory with the audio files
+            writer (StreamingDatasetWriter): Output the batches are appended to
+
+        Returns:
+            int: Number of rows written
+        """
+        tasks = self._discover(base_dir)
+        self._decode_audio(tasks)
+
+        batch = []
+        for features in self._rows(self.executor.map(tasks)):
+            row = self._create_base_row(features)
+            if writer.columns is None:
+                writer.set_template(self._dataset_template(row))
+            with self.profiler.stage("dataset.join"):
+                batch.extend(self.metadata.join_row(row, participant_on=self.participant_on))
+            if len(batch) >= writer.batch_size:
+                self._write_batch(batch, writer)
+                batch = []
+        if batch:
+            self._write_batch(batch, writer)
+        return writer.rows_written
+
+    def _build_dataset(self, raw_data: List[Dict]) -> pd.DataFrame:
+        df = self._create_base_df(raw_data)
+        with self.profiler.stage("dataset.join"):
+            df = self._enrich_with_eval_data(df)
+            df = self._enrich_with_participant_data(df)
+        with self.profiler.stage("dataset.finalize"):
+            return self._finalize_dataset(df)
+
+    def _rows(self, extracted: Iterable[Dict]) -> Iterator[Dict]:
+        """Row of each extracted recording, followed by one row per segment of the recording"""
+        for features in extracted:
+            features = self._store_contours(features)
+            segments = features.pop(SEGMENTS_KEY, [])
+            yield features
+            for segment in segments:
+                yield {'file': features['file'], 'label': features['label'], 'timed_out': features['timed_out'],
+                       **segment}
+
+    def _store_contours(self, features: Dict) -> Dict:
+        """Move the contours returned with the features of a file to the contour store"""
+        contours = features.pop(CONTOURS_KEY, None)
+        if contours is not None and self.contour_writer is not None:
+            self.contour_writer.add(features['file'], features['label'], contours)
+        return features
+
+    def _dataset_template(self, row: Dict) -> pd.DataFrame:
+        """Empty dataset typed like an extracted row and the metadata tables, fixing the streamed schema
+
+        A batch can miss every value of a metadata column, which would otherwise
+        make it a float column in the first batch and a string one later.
+        """
+        df = pd.DataFrame([row]).iloc[:0]
+        df = self._enrich_with_eval_data(df)
+        df = self._enrich_with_participant_data(df)
+        return self._finalize_dataset(df)
+
+    def _write_batch(self, batch: List[Dict], writer: StreamingDatasetWriter):
+        with self.profiler.stage("dataset.finalize"):
+            df = self._finalize_dataset(pd.DataFrame(batch))
+        with self.profiler.stage("dataset.write"):
+            writer.write(df)
+
+    def _decode_audio(self, tasks: List[Tuple[Path, str]]):
+        """Decode the recordings of the tasks into the audio store"""
+        if self.audio_store is None:
+            return
+        with self.profiler.stage("dataset.decode"):
+            self.audio_store.update({str(path): self.files[str(path)] for path, _ in tasks})
+
+    def _discover(self, base_dir: Path) -> List[Tuple[Path, str]]:
+        """Audio files to extract and their labels, recording their size and mtime in self.files"""
+        if self.manifest is None:
+            tasks = self._collect_audio_files(base_dir)
+            self.files = file_state(path for path, _ in tasks)
+            return tasks
+        entries = [entry for entry in self.manifest.refresh(base_dir) if self._is_valid_file(entry.path.name)]
+        self.files = {str(entry.path): {"size": entry.size, "mtime": entry.mtime_ns} for entry in entries}
+        return [(entry.path, entry.label) for entry in entries]
+
+    def _collect_audio_files(self, base_dir: Path) -> List[Tuple[Path, str]]:
+        """Audio files of the corpus in base_dir and their labels"""
+        raise NotImplementedError
+
+    def _get_valid_files(self, folder: Path):
+        return [f for f in folder.glob('*.wav') if self._is_valid_file(f.name)]
+
+    def _is_valid_file(self, name: str) -> bool:
+        return not (self.feature_extractor.exclude_segments and 'segment' in name)
+
+    def _sample_name(self, file: str) -> str:
+        """Sample name of a recording, identifying it in the evaluation data"""
+        raise NotImplementedError
+
+    def _create_base_df(self, data: List[Dict]) -> pd.DataFrame:
+        df = pd.DataFrame(data)
+        df['sample_name'] = df['file'].map(self._sample_name)
+        return df
+
+    def _create_base_row(self, features: Dict) -> Dict:
+        return {**features, 'sample_name': self._sample_name(features['file'])}
+
+    def _enrich_with_eval_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.metadata.enrich_with_eval_data(df)
+
+    def _enrich_with_participant_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.metadata.enrich_with_participant_data(df, on=self.participant_on)
+
+    def _finalize_dataset(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Cleanup operations
+        df = df.drop(columns=['SEX', 'DONOR', 'stimulussex', 'Participant'])
+        df = df[[c for c in df.columns if 'Face' not in c and 'Video' not in c]]
+        df.columns = df.columns.str.lower()
+        return df
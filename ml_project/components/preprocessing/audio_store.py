@@ -0,0 +1,130 @@
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+import librosa
+import numpy as np
+import pandas as pd
+
+# requested_rate is the rate a file was resampled to when stored, 0 when it kept its own rate
+INDEX_COLUMNS = ["file", "path", "size", "mtime", "requested_rate", "offset", "length", "sample_rate"]
+
+
+class AudioStore:
+    """Decoded audio of many recordings in one memory-mapped float32 buffer.
+
+    The mono samples of every recording are concatenated in ``<path>.f32`` and
+    ``<path>.index.csv`` maps the path of each file to its offset, length and
+    sample rate. ``get`` returns a read-only view of the buffer, so extractors
+    reuse the decoded (and resampled) audio without reading the WAV again.
+
+    ``requested_rate`` is the rate the store was built to resample to, None for
+    the own rate of each file. Extractors analysing the stored samples as they
+    are put it in the key of their cached features.
+
+    A store is created empty (or opened, if ``path`` exists) and filled by
+    ``update``, which the dataset creators call once the recordings of a run
+    are known; extractors holding the same store then read the new samples.
+
+    A store is pickled as its path and mapped again when unpickled, so it can
+    be handed to worker processes without copying the audio.
+    """
+
+    def __init__(self, path: Path, requested_rate: Optional[int] = None):
+        self.path = Path(path)
+        self.requested_rate = requested_rate
+        self._open()
+
+    def _open(self):
+        self.index = (pd.read_csv(self.index_path(self.path)) if self.index_path(self.path).exists()
+                      else pd.DataFrame(columns=INDEX_COLUMNS))
+        samples_path = self.samples_path(self.path)
+        self.samples = (np.memmap(samples_path, dtype=np.float32, mode="r")
+                        if samples_path.exists() and samples_path.stat().st_size
+                        else np.empty(0, dtype=np.float32))
+        # Keyed by path, recordings of different folders can share a file name
+        self._rows = {
+            row.path: (row.offset, row.length, row.sample_rate)
+            for row in self.index.itertuples(index=False)
+        }
+
+    def __reduce__(self):
+        return AudioStore, (self.path, self.requested_rate)
+
+    @staticmethod
+    def samples_path(path: Path) -> Path:
+        return path.with_name(path.name + ".f32")
+
+    @staticmethod
+    def index_path(path: Path) -> Path:
+        return path.with_name(path.name + ".index.csv")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, file_path: Path) -> bool:
+        return str(file_path) in self._rows
+
+    def sample_rate(self, file_path: Path) -> int:
+        return int(self._rows[str(file_path)][2])
+
+    def get(self, file_path: Path, sample_rate: Optional[int] = None) -> Optional[np.ndarray]:
+        """Read-only view of the samples of a file
+
+        Returns:
+            Optional[np.ndarray]: The samples, or None if the file is not stored (at sample_rate, when given)
+        """
+        row = self._rows.get(str(file_path))
+        if row is None or (sample_rate is not None and row[2] != sample_rate):
+            return None
+        offset, length, _ = row
+        return self.samples[offset:offset + length]
+
+    @classmethod
+    def build(cls, path: Path, files: Dict[str, Dict[str, int]], sample_rate: Optional[int] = None) -> "AudioStore":
+        """Open the store at path, resampling to sample_rate, and update it with files"""
+        store = cls(path, sample_rate)
+        store.update(files)
+        return store
+
+    def update(self, files: Dict[str, Dict[str, int]]):
+        """Decode the files that are not in the store yet, or changed since, and append them to it
+
+        Files already stored with the same size, mtime and sample rate are not
+        decoded again. The samples of changed files are appended and the old
+        ones are left unused; delete the store to reclaim that space. The store
+        is mapped again afterwards, so ``get`` serves the new files.
+
+        Args:
+            files (Dict[str, Dict[str, int]]): Output of dataset_io.file_state for the files to store
+        """
+        path, sample_rate, index = self.path, self.requested_rate, self.index
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stored = {
+            row.path: (row.size, row.mtime, row.requested_rate)
+            for row in index.itertuples(index=False)
+        }
+        offset = self.samples_path(path).stat().st_size // 4 if self.samples_path(path).exists() else 0
+
+        added = []
+        with open(self.samples_path(path), "ab") as f:
+            for file_path, state in files.items():
+                if stored.get(file_path) == (state["size"], state["mtime"], sample_rate or 0):
+                    continue
+                try:
+                    y, sr = librosa.load(file_path, sr=sample_rate, mono=True)
+                except Exception as e:
+                    logging.error(f"Error decoding {Path(file_path).name}: {str(e)}")
+                    continue
+                f.write(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+                added.append({"file": Path(file_path).name, "path": file_path, "size": state["size"],
+                              "mtime": state["mtime"], "requested_rate": sample_rate or 0,
+                              "offset": offset, "length": len(y), "sample_rate": sr})
+                offset += len(y)
+
+        if added or not self.index_path(path).exists():
+            logging.info(f"Decoded {len(added)} files into the audio store {path}")
+            index = pd.concat([index[~index["path"].isin([row["path"] for row in added])], pd.DataFrame(added)],
+                              ignore_index=True)
+            index.reindex(columns=INDEX_COLUMNS).to_csv(self.index_path(path), index=False)
+        self._open()
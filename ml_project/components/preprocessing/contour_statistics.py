@@ -0,0 +1,104 @@
+import re
+import warnings
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml_project.components.preprocessing.contour_store import CONTOUR_NAMES, ContourStore
+
+STATISTICS = ("mean", "median", "std", "min", "max", "range", "slope", "voiced_fraction")
+_PERCENTILE = re.compile(r"^p(\d{1,2}(?:\.\d+)?)$")
+
+
+def parse_statistic(name: str) -> Tuple[str, str]:
+    """Split a statistic name such as "f0_p90" or "intensity_slope" into contour and statistic"""
+    contour, _, statistic = name.partition("_")
+    if contour not in CONTOUR_NAMES:
+        raise ValueError(f"Unknown contour in statistic {name}. Available contours: {', '.join(CONTOUR_NAMES)}")
+    if statistic not in STATISTICS and not _PERCENTILE.match(statistic):
+        raise ValueError(f"Unknown statistic in {name}. Available statistics: {', '.join(STATISTICS)} and p<q>")
+    return contour, statistic
+
+
+def _slopes(frames: np.ndarray, steps: np.ndarray) -> np.ndarray:
+    """Least squares slope per second of every row over its defined frames"""
+    defined = ~np.isnan(frames)
+    times = np.arange(frames.shape[1]) * steps[:, None]
+    n = defined.sum(axis=1)
+    t = np.where(defined, times, 0.0)
+    v = np.where(defined, frames, 0.0)
+    covariance = (t * v).sum(axis=1) - t.sum(axis=1) * v.sum(axis=1) / np.maximum(n, 1)
+    variance = (t * t).sum(axis=1) - t.sum(axis=1) ** 2 / np.maximum(n, 1)
+    return np.divide(covariance, variance, out=np.full(len(n), np.nan), where=(n > 1) & (variance > 0))
+
+
+def _contour_statistics(frames: np.ndarray, lengths: np.ndarray, steps: np.ndarray,
+                        statistics: List[str]) -> Dict[str, np.ndarray]:
+    frames = frames.astype(np.float64)
+    values = {}
+    percentiles = {
+        statistic: 50.0 if statistic == "median" else float(_PERCENTILE.match(statistic).group(1))
+        for statistic in statistics if statistic == "median" or _PERCENTILE.match(statistic)
+    }
+    with warnings.catch_warnings():
+        # Files without a single defined frame get NaN statistics
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if percentiles and frames.shape[1]:
+            # Praat interpolates quantiles at position n * q + 0.5, i.e. the "hazen" method
+            quantiles = np.nanpercentile(frames, list(percentiles.values()), axis=1, method="hazen")
+            values.update(zip(percentiles, quantiles))
+        for statistic in statistics:
+            if statistic in values:
+                continue
+            if not frames.shape[1]:
+                values[statistic] = np.full(len(lengths), np.nan)
+            elif statistic == "mean":
+                values[statistic] = np.nanmean(frames, axis=1)
+            elif statistic == "std":
+                values[statistic] = np.nanstd(frames, axis=1, ddof=1)
+            elif statistic == "min":
+                values[statistic] = np.nanmin(frames, axis=1)
+            elif statistic == "max":
+                values[statistic] = np.nanmax(frames, axis=1)
+            elif statistic == "range":
+                values[statistic] = np.nanmax(frames, axis=1) - np.nanmin(frames, axis=1)
+            elif statistic == "slope":
+                values[statistic] = _slopes(frames, steps)
+            elif statistic == "voiced_fraction":
+                defined = (~np.isnan(frames)).sum(axis=1)
+                values[statistic] = np.divide(defined, lengths, out=np.full(len(lengths), np.nan),
+                                              where=lengths > 0)
+    return values
+
+
+def aggregate_contours(store: ContourStore, statistics: List[str]) -> pd.DataFrame:
+    """Summary statistics of the contours of every file in a store
+
+    Each contour is loaded once as a padded (n_files, n_frames) array and every
+    statistic is computed for all files at once, ignoring undefined (NaN) frames.
+    Statistics are named "<contour>_<statistic>", with contours f0, f1, f2, f3
+    and intensity, and statistics mean, median, std, min, max, range, slope (per
+    second), voiced_fraction (defined frames over all frames) or p<q> for the
+    q-th percentile, e.g. "f0_p10", "f1_range", "intensity_slope".
+
+    Args:
+        store (ContourStore): Contours written during feature extraction
+        statistics (List[str]): Names of the statistics to compute
+
+    Returns:
+        pd.DataFrame: One row per file, with a "file" column and one column per statistic
+    """
+    by_contour = defaultdict(list)
+    for name in statistics:
+        contour, statistic = parse_statistic(name)
+        by_contour[contour].append(statistic)
+
+    df = pd.DataFrame({"file": store.files})
+    for contour, contour_statistics in by_contour.items():
+        frames, lengths = store.frames(contour)
+        values = _contour_statistics(frames, lengths, store.steps(contour), contour_statistics)
+        for statistic in contour_statistics:
+            df[f"{contour}_{statistic}"] = values[statistic]
+    return df[["file", *statistics]]
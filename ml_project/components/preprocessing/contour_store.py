@@ -0,0 +1,118 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Key under which extractors return frame-level contours next to the scalar features. It is
+# popped by the dataset creators before the features become a row of the dataset.
+CONTOURS_KEY = "_contours"
+CONTOUR_NAMES = ("f0", "f1", "f2", "f3", "intensity")
+
+
+def contour_schema() -> pa.Schema:
+    fields = [pa.field("file", pa.string()), pa.field("label", pa.string())]
+    for name in CONTOUR_NAMES:
+        fields.append(pa.field(name, pa.list_(pa.float32())))
+        fields.append(pa.field(f"{name}_step", pa.float32()))
+    return pa.schema(fields)
+
+
+class ContourStoreWriter:
+    """Appends the frame-level contours of extracted files to a Parquet side store.
+
+    Every file is one row with its F0, F1-F3 and intensity contours as
+    list<float32> columns (NaN on frames where the value is undefined) and the
+    time between frames of each contour in ``<name>_step``. Rows are buffered and
+    written ``batch_size`` at a time.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 256):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.schema = contour_schema()
+        self.rows: List[Dict] = []
+        self.rows_written = 0
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def add(self, file: str, label: str, contours: Dict):
+        row = {"file": file, "label": label}
+        for name in CONTOUR_NAMES:
+            values = contours.get(name)
+            row[name] = None if values is None else np.asarray(values, dtype=np.float32)
+            row[f"{name}_step"] = contours.get(f"{name}_step")
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        self._writer.write_table(pa.Table.from_pylist(self.rows, schema=self.schema))
+        self.rows_written += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self._writer is None:
+            # Still write an empty store so readers find one
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(self.schema.empty_table(), self.path)
+        else:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "ContourStoreWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ContourStore:
+    """Read side of a store written by ContourStoreWriter"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.table = pq.read_table(self.path)
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def files(self) -> np.ndarray:
+        return self.table["file"].to_numpy(zero_copy_only=False)
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self.table["label"].to_numpy(zero_copy_only=False)
+
+    def steps(self, name: str) -> np.ndarray:
+        """Time between frames of a contour of every file, in seconds"""
+        return self.table[f"{name}_step"].to_numpy(zero_copy_only=False).astype(np.float64)
+
+    def frames(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Contour of every file as one NaN padded (n_files, n_frames) float32 array
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The padded contours and the number of frames of each file
+        """
+        column = self.table[name].combine_chunks()
+        offsets = column.offsets.to_numpy()
+        lengths = np.diff(offsets)
+        values = column.flatten().to_numpy(zero_copy_only=False)
+
+        frames = np.full((len(lengths), lengths.max(initial=0)), np.nan, dtype=np.float32)
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        columns = np.arange(len(values)) - np.repeat(offsets[:-1] - offsets[0], lengths)
+        frames[rows, columns] = values
+        return frames, lengths
+
+    def get(self, file: str, name: str) -> np.ndarray:
+        """Contour of one file"""
+        row = int(np.flatnonzero(self.files == file)[0])
+        return np.asarray(self.table[name][row].as_py(), dtype=np.float32)
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+# A directory modified this close to its last scan may have changed again within the
+# resolution of its mtime (1-2 s on some network filesystems), so it is scanned again
+RACY_INTERVAL_NS = 2 * 10 ** 9
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    path: Path
+    size: int
+    mtime_ns: int
+    label: str
+
+
+class CorpusManifest:
+    """Persisted listing of the audio files of a corpus, refreshed incrementally.
+
+    The manifest records, for every directory down to ``depth`` levels below
+    the base directory, its mtime, its subdirectories and the size, mtime and
+    label of its ``*.wav`` files. A refresh only stats the directories: one whose
+    mtime did not change since it was scanned keeps its cached listing, so
+    discovering an unchanged corpus does not list or stat a single audio file.
+
+    Adding, removing or renaming files changes the mtime of their directory, as
+    does rewriting them through a temporary file. A file overwritten in place
+    keeps its cached size and mtime until its directory changes, unless
+    ``stat_files`` is set: the files of unchanged directories are then stat'ed
+    (but not listed) again, as needed by consumers that compare file states
+    between runs, such as incremental dataset rebuilds.
+    """
+
+    def __init__(self, path: Path, depth: int = 0, stat_files: bool = False):
+        self.path = Path(path)
+        self.depth = depth
+        self.stat_files = stat_files
+        self.base_dir = None
+        self.directories: Dict[str, Dict] = {}
+        self.directories_scanned = 0
+        self.directories_reused = 0
+        if self.path.exists():
+            with open(self.path) as f:
+                manifest = json.load(f)
+            if manifest.get("depth") == depth:
+                self.base_dir = manifest["base_dir"]
+                self.directories = manifest["directories"]
+
+    def refresh(self, base_dir: Path) -> List[ManifestEntry]:
+        """Bring the manifest up to date with base_dir and save it if anything changed
+
+        Returns:
+            List[ManifestEntry]: The audio files ``depth`` levels below base_dir, sorted by path
+        """
+        if self.base_dir != str(base_dir):
+            # A manifest of another corpus
+            self.base_dir, self.directories = str(base_dir), {}
+        previous = self.directories
+        self.directories = {}
+        self.directories_scanned = self.directories_reused = 0
+        self._refresh_directory(Path(base_dir), "", 0, previous)
+        logging.info(f"Corpus manifest: {self.directories_scanned} directories scanned, "
+                     f"{self.directories_reused} unchanged")
+        if self.directories != previous:
+            self.save()
+
+        entries = []
+        for relative, directory in sorted(self.directories.items()):
+            if self._level(relative) != self.depth:
+                continue
+            for name, state in sorted(directory["files"].items()):
+                entries.append(ManifestEntry(Path(base_dir) / relative / name,
+                                             state["size"], state["mtime_ns"], state["label"]))
+        return entries
+
+    def _refresh_directory(self, directory: Path, relative: str, level: int, previous: Dict[str, Dict]):
+        mtime_ns = directory.stat().st_mtime_ns
+        cached = previous.get(relative)
+        if cached and cached["mtime_ns"] == mtime_ns and cached["scanned_ns"] - mtime_ns > RACY_INTERVAL_NS:
+            listing = self._restat(directory, cached) if self.stat_files else cached
+            self.directories_reused += 1
+        else:
+            listing = self._scan(directory, mtime_ns)
+            self.directories_scanned += 1
+        self.directories[relative] = listing
+        if level < self.depth:
+            for name in listing["subdirectories"]:
+                self._refresh_directory(directory / name, f"{relative}/{name}" if relative else name,
+                                        level + 1, previous)
+
+    @staticmethod
+    def _scan(directory: Path, mtime_ns: int) -> Dict:
+        subdirectories, files = [], {}
+        scanned_ns = time.time_ns()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirectories.append(entry.name)
+                elif entry.is_file() and entry.name.endswith(".wav"):
+                    stat = entry.stat()
+                    files[entry.name] = {
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "label": Path(entry.name).stem.split('_')[0],
+                    }
+        return {"mtime_ns": mtime_ns, "scanned_ns": scanned_ns,
+                "subdirectories": sorted(subdirectories), "files": files}
+
+    @classmethod
+    def _restat(cls, directory: Path, listing: Dict) -> Dict:
+        """The listing with the current size and mtime of its files, rescanned if one is gone"""
+        files = {}
+        for name, state in listing["files"].items():
+            try:
+                stat = os.stat(directory / name)
+            except FileNotFoundError:
+                return cls._scan(directory, listing["mtime_ns"])
+            files[name] = {**state, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return {**listing, "files": files}
+
+    @staticmethod
+    def _level(relative: str) -> int:
+        return relative.count("/") + 1 if relative else 0
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"base_dir": self.base_dir, "depth": self.depth, "directories": self.directories}, f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "manifest_directories_scanned": self.directories_scanned,
+            "manifest_directories_reused": self.directories_reused,
+        }
@@ -0,0 +1,227 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FILES_SUFFIX = ".files.json"
+OUTPUT_FORMATS = ("csv", "parquet")
+# Low-cardinality string columns stored as dictionary encoded categoricals in Parquet datasets
+CATEGORICAL_COLUMNS = ("label", "sample_name", "sex")
+
+
+def file_state(paths: Iterable[Path]) -> Dict[str, Dict[str, int]]:
+    """Size and modification time of each audio file, used to detect changes between runs
+
+    Args:
+        paths (Iterable[Path]): Audio files
+
+    Returns:
+        Dict[str, Dict[str, int]]: Mapping from file path to its size and mtime (ns)
+    """
+    state = {}
+    for path in paths:
+        stat = path.stat()
+        state[str(path)] = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    return state
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast float columns to float32 and store the categorical columns as pandas categoricals"""
+    df = df.copy()
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype("category")
+        elif pd.api.types.is_float_dtype(df[column]):
+            df[column] = df[column].astype(np.float32)
+    return df
+
+
+def dataset_schema(df: pd.DataFrame) -> pa.Schema:
+    """Arrow schema of a dataset: float32 features, dictionary encoded categoricals, inferred types otherwise"""
+    fields = []
+    for column in df.columns:
+        if column in CATEGORICAL_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif pd.api.types.is_float_dtype(df[column]):
+            fields.append(pa.field(column, pa.float32()))
+        elif pd.api.types.is_object_dtype(df[column]) or isinstance(df[column].dtype, pd.StringDtype):
+            # Strings, also when every value of the frame is missing
+            fields.append(pa.field(column, pa.string()))
+        else:
+            fields.append(pa.Schema.from_pandas(df[[column]], preserve_index=False).field(column))
+    return pa.schema(fields)
+
+
+def to_arrow_table(df: pd.DataFrame, schema: Optional[pa.Schema] = None) -> pa.Table:
+    """Convert a dataset to an Arrow table with the compact schema, or with the given schema"""
+    df = compact_dtypes(df)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].cat.rename_categories(str)
+    if schema is not None:
+        for field in schema:
+            if field.type == pa.string() and field.name in df.columns:
+                # A batch where the column is all missing has it as floats
+                df[field.name] = df[field.name].astype(object).where(df[field.name].notna(), None)
+    return pa.Table.from_pandas(df, schema=schema or dataset_schema(df), preserve_index=False)
+
+
+def write_parquet(df: pd.DataFrame, output_path: Path, partition_cols: Optional[List[str]] = None):
+    """Write a dataset as Parquet with the compact schema, partitioned into a directory if partition_cols are given"""
+    table = to_arrow_table(df)
+    if partition_cols:
+        pq.write_to_dataset(table, root_path=output_path, partition_cols=partition_cols)
+    else:
+        pq.write_table(table, output_path)
+
+
+class StreamingDatasetWriter:
+    """Appends a dataset to its output batch by batch while it is being built.
+
+    CSV datasets are appended to a single file. Parquet datasets are written as a
+    directory with one file per batch, so every batch written so far can be read
+    with read_dataset while the run is still in progress. The columns and the
+    Parquet schema are fixed by ``set_template`` before the first batch, or
+    else inferred from the first batch.
+    """
+
+    def __init__(self, output_path: Path, output_format: str = "csv", batch_size: int = 256,
+                 partition_cols: Optional[List[str]] = None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.output_path = output_path
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.partition_cols = partition_cols
+        self.columns: Optional[List[str]] = None
+        self.schema: Optional[pa.Schema] = None
+        self.batches_written = 0
+        self.rows_written = 0
+
+    def set_template(self, template: pd.DataFrame):
+        """Fix the columns and the schema from a frame typed like the dataset, e.g. an empty one"""
+        self.columns = list(template.columns)
+        self.schema = dataset_schema(compact_dtypes(template))
+
+    def schema_summary(self) -> Dict[str, str]:
+        """Type of every column written, to describe the dataset without reading it back"""
+        if self.schema is not None:
+            return {field.name: str(field.type) for field in self.schema}
+        return {column: "unknown" for column in self.columns or []}
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        if self.columns is None:
+            self.columns = list(df.columns)
+        df = df.reindex(columns=self.columns)
+
+        if self.schema is None:
+            self.schema = dataset_schema(compact_dtypes(df))
+        if self.output_format == "parquet":
+            pq.write_to_dataset(to_arrow_table(df, self.schema), root_path=self.output_path, partition_cols=self.partition_cols,
+                                basename_template=f"part-{self.batches_written:05d}-{{i}}.parquet")
+        else:
+            df.to_csv(self.output_path, mode="a", header=self.batches_written == 0, index=False)
+        self.batches_written += 1
+        self.rows_written += len(df)
+
+
+def read_dataset(path: Path) -> pd.DataFrame:
+    """Read a dataset written by save_dataset, in CSV or Parquet format"""
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def save_dataset(df: pd.DataFrame, output_dir: Path, prefix: str,
+                 files: Optional[Dict[str, Dict[str, int]]] = None,
+                 output_format: str = "csv",
+                 partition_cols: Optional[List[str]] = None,
+                 params: Optional[Dict] = None) -> Path:
+    """Write a timestamped dataset and, if given, the state of the files it was built from
+
+    Args:
+        df (pd.DataFrame): Dataset to write
+        output_dir (Path): Directory where the dataset is written
+        prefix (str): File name prefix, e.g. "vowel_features"
+        files (Optional[Dict[str, Dict[str, int]]]): Output of file_state for the source audio files
+        output_format (str): "csv" or "parquet"
+        partition_cols (Optional[List[str]]): Columns to partition a Parquet dataset by
+        params (Optional[Dict]): Parameters the features were extracted with, stored with the file state
+
+    Returns:
+        Path: Path of the written dataset (a directory for partitioned Parquet datasets)
+    """
+    output_path = dataset_output_path(output_dir, prefix, output_format)
+    if output_format == "parquet":
+        write_parquet(df, output_path, partition_cols)
+    else:
+        df.to_csv(output_path, index=False)
+    if files is not None:
+        save_file_state(output_path, files, params)
+    return output_path
+
+
+def dataset_output_path(output_dir: Path, prefix: str, output_format: str = "csv") -> Path:
+    """Timestamped path of a new dataset in output_dir"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
+    return output_dir / f"{prefix}_{timestamp}.{output_format}"
+
+
+def save_file_state(output_path: Path, files: Dict[str, Dict[str, int]], params: Optional[Dict] = None):
+    """Store the state of the audio files a dataset was built from next to the dataset
+
+    The parameters the features were extracted with are stored with it: the rows
+    of unchanged files are only reusable if these did not change either.
+    """
+    with open(output_path.with_suffix(FILES_SUFFIX), "w") as f:
+        json.dump({"files": files, "params": _json_params(params)}, f)
+
+
+def _json_params(params: Optional[Dict]) -> Optional[Dict]:
+    """Parameters as they read back from JSON, so stored and current ones compare equal"""
+    return json.loads(json.dumps(params, sort_keys=True, default=str)) if params is not None else None
+
+
+def load_latest_dataset(output_dir: Path, prefix: str,
+                        params: Optional[Dict] = None) -> Optional[Tuple[pd.DataFrame, Dict[str, Dict[str, int]]]]:
+    """Load the most recent dataset written by save_dataset together with its file state
+
+    Args:
+        output_dir (Path): Directory where datasets are written
+        prefix (str): File name prefix, e.g. "vowel_features"
+        params (Optional[Dict]): Parameters the features are extracted with now. A dataset stored
+            with other parameters is not returned, as none of its rows can be reused.
+
+    Returns:
+        Optional[Tuple[pd.DataFrame, Dict[str, Dict[str, int]]]]: The dataset and its file state,
+            or None when there is no previous dataset with a recorded file state and the same params
+    """
+    candidates = sorted(
+        path for output_format in OUTPUT_FORMATS
+        for path in output_dir.glob(f"{prefix}_*.{output_format}")
+        if path.with_suffix(FILES_SUFFIX).exists()
+    ) if output_dir.exists() else []
+    if not candidates:
+        return None
+
+    latest = candidates[-1]
+    with open(latest.with_suffix(FILES_SUFFIX)) as f:
+        state = json.load(f)
+    if "files" not in state:
+        # Written before the parameters were recorded, as the bare file state
+        state = {"files": state}
+    if state.get("params") != _json_params(params):
+        logging.info(f"Previous dataset {latest} was extracted with other parameters, rebuilding in full")
+        return None
+    logging.info(f"Loading previous dataset {latest}")
+    return read_dataset(latest), state["files"]
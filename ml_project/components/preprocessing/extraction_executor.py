@@ -0,0 +1,397 @@
+import heapq
+import logging
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml_project.components.preprocessing.feature_cache import FeatureCache
+from ml_project.logging.profiler import StageProfiler
+from ml_project.src.interfaces import FeatureExtractor
+
+# Feature extractor used by the current worker process. It is set once per
+# worker by the pool initializer so it is not pickled again for every file.
+_worker_extractor: Optional[FeatureExtractor] = None
+
+
+def _init_worker(feature_extractor: FeatureExtractor):
+    global _worker_extractor
+    _worker_extractor = feature_extractor
+    # The copy carries the records the parent had collected when the pool started,
+    # which the parent already holds: only the worker's own are sent back
+    profiler = getattr(feature_extractor, "profiler", None)
+    if profiler is not None:
+        profiler.drain()
+
+
+def _extract_in_worker(file_path: Path, label: str) -> Tuple[Dict, float, Optional[Dict]]:
+    start = time.perf_counter()
+    features = _worker_extractor.extract_features(file_path=file_path, label=label)
+    duration = time.perf_counter() - start
+    # Send the profile records of the worker's copy of the extractor back with the features
+    profiler = getattr(_worker_extractor, "profiler", None)
+    return features, duration, profiler.drain() if profiler is not None and profiler.enabled else None
+
+
+class _WorkerPool:
+    """Process pool over a feature extractor whose workers can be killed.
+
+    A file stuck in a native call (Praat, NumPy) cannot be interrupted from
+    Python, so a file over its time budget is stopped by killing the worker
+    processes and starting new ones.
+    """
+
+    def __init__(self, feature_extractor: FeatureExtractor, workers: int):
+        self.feature_extractor = feature_extractor
+        self.workers = workers
+        self.pool = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   initializer=_init_worker,
+                                   initargs=(self.feature_extractor,))
+
+    def submit(self, file_path: Path, label: str) -> Future:
+        return self.pool.submit(_extract_in_worker, file_path, label)
+
+    def restart(self):
+        """Kill the workers, failing the files they were extracting, and start new ones"""
+        # ProcessPoolExecutor has no public way to stop a running call
+        for process in list((self.pool._processes or {}).values()):
+            process.terminate()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.pool = self._start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class ExtractionExecutor:
+    """Runs a feature extractor over a list of audio files.
+
+    With ``workers`` <= 1 the files are processed one at a time in the current
+    process. Otherwise they are fanned out over a process pool. In both cases the
+    results are yielded in the same order as the input tasks, so the resulting
+    dataset does not depend on the number of workers. The pool only starts files
+    less than ``reorder_window`` positions after the oldest unfinished one, so
+    at most that many results wait to be yielded in order, and memory does not
+    grow with the number of files.
+
+    When a ``cache`` is given, files whose content and analysis parameters were
+    already extracted are served from it and only the misses are extracted.
+    Files are looked up as they are reached, so hits hold no more memory than
+    extracted rows and the first rows are yielded without hashing the corpus.
+    Rows whose features are all NaN, i.e. files the extractor failed on, are
+    not cached so they are tried again on the next run. A file that cannot be
+    read to compute its key is extracted without the cache.
+
+    The profile records of the extractor copies in worker processes are merged
+    into ``profiler``, which should be the extractor's own profiler.
+
+    With ``longest_first`` and several workers, the pool starts the largest of
+    the next ``reorder_window`` files first, so a long recording does not start
+    last and stall the end of the run. With a ``time_budget`` (seconds), files
+    are always extracted in worker processes, even with one worker, and a file
+    that exceeds its budget is stopped by killing the workers. It is retried
+    after the other files, up to ``retries`` times with the budget multiplied by
+    ``retry_budget_factor`` each time, so retried files are yielded last. A file
+    still over budget is returned as a row of NaN features with ``timed_out``
+    set, and is not cached. Every row has a ``timed_out`` column.
+    ``stats`` reports the per-file durations and stragglers of the last run.
+
+    An extractor with an ``extract_batch(tasks)`` method, such as
+    OpenSmileFeatureExtractor, is given whole batches of tasks instead and
+    parallelises them itself: ``workers``, ``longest_first`` and
+    ``time_budget`` do not apply to it.
+    """
+
+    def __init__(self, feature_extractor: FeatureExtractor, workers: int = 1,
+                 cache: Optional[FeatureCache] = None, profiler: Optional[StageProfiler] = None,
+                 longest_first: bool = False, time_budget: Optional[float] = None, retries: int = 1,
+                 retry_budget_factor: float = 2.0, reorder_window: Optional[int] = None):
+        self.feature_extractor = feature_extractor
+        self.workers = workers
+        self.cache = cache
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.longest_first = longest_first
+        if time_budget is not None and hasattr(feature_extractor, "extract_batch"):
+            logging.warning(f"{type(feature_extractor).__name__} extracts files in batches, "
+                            f"the per-file time budget is not applied")
+            time_budget = None
+        self.time_budget = time_budget
+        self.retries = retries
+        self.retry_budget_factor = retry_budget_factor
+        # Files eligible to start ahead of the oldest unfinished one, bounding the results held for ordering
+        self.reorder_window = reorder_window or 16 * max(workers, 1)
+        self.durations: Dict[str, float] = {}
+        self.completion_times: List[float] = []
+        self.retried: List[str] = []
+        self.timed_out: List[str] = []
+
+    def map(self, tasks: Iterable[Tuple[Path, str]]) -> Iterator[Dict]:
+        """Extract features for every (file_path, label) task
+
+        Args:
+            tasks (Iterable[Tuple[Path, str]]): Audio files and their labels
+
+        Yields:
+            Dict: Features of each file, in input order except for files retried after a timeout
+        """
+        tasks: List[Tuple[Path, str]] = list(tasks)
+        if hasattr(self.feature_extractor, "extract_batch"):
+            rows = self._extract_batches(tasks)
+        else:
+            rows = self._extract_scheduled(tasks)
+        for features in rows:
+            features.setdefault("timed_out", False)
+            yield features
+
+    @property
+    def analysis_params(self) -> Dict:
+        """Extractor class and the parameters that determine its values, keying the cached features"""
+        return {
+            "extractor": type(self.feature_extractor).__name__,
+            **getattr(self.feature_extractor, "analysis_params", {})
+        }
+
+    def _lookup(self, file_path: Path, label: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Cache key of a file and its cached features
+
+        Returns:
+            Tuple[Optional[str], Optional[Dict]]: The key, None without a cache or if the file cannot
+                be read, and the cached features, None on a miss
+        """
+        if self.cache is None:
+            return None, None
+        with self.profiler.stage("cache.lookup"):
+            try:
+                key = self.cache.key(file_path, self.analysis_params)
+            except OSError as e:
+                logging.error(f"Error reading {file_path.name} for the feature cache, extracting it uncached: {str(e)}")
+                return None, None
+            features = self.cache.get(key)
+        if features is None:
+            return key, None
+        return key, {**features, "file": file_path.name, "label": label}
+
+    def _store(self, key: Optional[str], features: Dict):
+        """Cache the extracted features of a file, unless it timed out or failed"""
+        if key is not None and not features.get("timed_out") and not self._failed(features):
+            self.cache.put(key, features)
+
+    def _failed(self, features: Dict) -> bool:
+        """Whether every feature of the extractor's template is NaN in the row"""
+        template = getattr(self.feature_extractor, "feature_template", None)
+        if not template:
+            return False
+        return all(pd.isna(features.get(column)) for column in template)
+
+    def _extract_batches(self, tasks: List[Tuple[Path, str]]) -> Iterator[Dict]:
+        """Hand the tasks to the extractor's own batch processing, which parallelises them itself"""
+        batch_size = getattr(self.feature_extractor, "batch_size", None) or max(len(tasks), 1)
+        for start in range(0, len(tasks), batch_size):
+            batch = tasks[start:start + batch_size]
+            lookups = [self._lookup(file_path, label) for file_path, label in batch]
+            misses = [task for task, (_, cached) in zip(batch, lookups) if cached is None]
+            extracted = iter(self.feature_extractor.extract_batch(misses) if misses else [])
+            for key, cached in lookups:
+                if cached is not None:
+                    yield cached
+                    continue
+                features = next(extracted)
+                self._store(key, features)
+                yield features
+
+    def _extract_scheduled(self, tasks: List[Tuple[Path, str]]) -> Iterator[Dict]:
+        """Extract file by file, yielding in input order as soon as the next file is final"""
+        self.durations, self.completion_times, self.retried, self.timed_out = {}, [], [], []
+        start = time.perf_counter()
+        if self.time_budget is None and (self.workers <= 1 or len(tasks) <= 1):
+            # Serially, reordering cannot shorten the run, so files are extracted in input order
+            for file_path, label in tasks:
+                key, features = self._lookup(file_path, label)
+                if features is None:
+                    file_start = time.perf_counter()
+                    features = self.feature_extractor.extract_features(file_path=file_path, label=label)
+                    self._finished(file_path, time.perf_counter() - file_start, start)
+                    self._store(key, features)
+                yield features
+        else:
+            # A time budget is enforced by killing the worker, so it needs a pool even for one worker
+            yield from self._extract_pooled(tasks, start)
+
+        stragglers = sorted(self.durations.items(), key=lambda item: item[1], reverse=True)[:5]
+        if stragglers:
+            logging.info("Slowest files: " + ", ".join(f"{Path(path).name} ({duration:.1f} s)"
+                                                       for path, duration in stragglers))
+
+    def _finished(self, file_path: Path, duration: float, start: float):
+        """Record the duration of an attempt at a file and when it completed in the run"""
+        self.durations[str(file_path)] = duration
+        self.completion_times.append(time.perf_counter() - start)
+
+    def _extract_pooled(self, tasks: List[Tuple[Path, str]], start: float) -> Iterator[Dict]:
+        """Extract over the process pool, then retry the files that timed out
+
+        Each pass yields its files in order. The files that timed out are
+        deferred to the next pass, with a larger budget, so they are yielded
+        after the others.
+        """
+        attempts: Dict[int, int] = {}
+        keys: Dict[int, Optional[str]] = {}
+        indices = list(range(len(tasks)))
+        with _WorkerPool(self.feature_extractor, max(self.workers, 1)) as pool:
+            while indices:
+                deferred: List[int] = []
+                yield from self._pool_pass(pool, tasks, indices, attempts, keys, deferred, start)
+                if deferred:
+                    logging.info(f"Retrying {len(deferred)} files that exceeded their time budget")
+                indices = sorted(deferred)
+
+    def _pool_pass(self, pool: _WorkerPool, tasks: List[Tuple[Path, str]], indices: List[int],
+                   attempts: Dict[int, int], keys: Dict[int, Optional[str]], deferred: List[int],
+                   start: float) -> Iterator[Dict]:
+        """Extract the tasks at the given indices over the pool, yielding in their order
+
+        Only the files less than ``reorder_window`` positions after the oldest
+        unfinished one are eligible to start, so at most that many results wait
+        for an earlier file before being yielded. Files are looked up in the
+        cache as they become eligible, and hits take their place among the
+        waiting results without being submitted. Among the eligible files the
+        largest starts first with ``longest_first``.
+
+        With a time budget, a file is only submitted when a worker is free, so
+        its budget counts from the submission. Once a file exceeds it, the
+        workers are restarted and the other files they were extracting are
+        submitted again. The file is appended to ``deferred`` if it has retries
+        left, otherwise it gets a timed-out row.
+        """
+        sizes = ([os.path.getsize(tasks[index][0]) for index in indices] if self.longest_first
+                 else [0] * len(indices))
+        eligible: List[Tuple[int, int]] = []  # heap of (-size, position)
+        admitted = next_position = 0
+        results: Dict[int, Dict] = {}
+        skipped: Set[int] = set()
+        # Keep one task queued per worker beyond the running ones, so no worker waits, unless
+        # the budget has to start with the extraction
+        capacity = pool.workers if self.time_budget is not None else 2 * pool.workers
+        running: Dict[Future, Tuple[int, float]] = {}  # future -> (position, deadline)
+        while next_position < len(indices):
+            while admitted < min(next_position + self.reorder_window, len(indices)):
+                index = indices[admitted]
+                cached = None
+                if index not in keys:
+                    keys[index], cached = self._lookup(*tasks[index])
+                if cached is not None:
+                    results[admitted] = cached
+                else:
+                    heapq.heappush(eligible, (-sizes[admitted], admitted))
+                admitted += 1
+            while len(running) < capacity and eligible:
+                position = heapq.heappop(eligible)[1]
+                budget = self._budget(attempts.get(indices[position], 0))
+                future = pool.submit(*tasks[indices[position]])
+                running[future] = (position, time.monotonic() + budget if budget is not None else math.inf)
+
+            timeout = None
+            if self.time_budget is not None and running:
+                timeout = max(min(deadline for _, deadline in running.values()) - time.monotonic(), 0)
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED) if running else (set(), set())
+            for future in done:
+                position, _ = running.pop(future)
+                results[position] = self._completed(future, tasks[indices[position]][0], keys[indices[position]],
+                                                    start)
+
+            now = time.monotonic()
+            expired = {position for future, (position, deadline) in running.items()
+                       if deadline <= now and not future.done()}
+            if expired:
+                pool.restart()
+                for future, (position, _) in running.items():
+                    index = indices[position]
+                    if future.done() and not future.cancelled() and future.exception() is None:
+                        results[position] = self._completed(future, tasks[index][0], keys[index], start)
+                    elif position not in expired:
+                        heapq.heappush(eligible, (-sizes[position], position))
+                    elif self._timed_out(index, tasks[index], attempts, start):
+                        results[position] = self._timed_out_row(*tasks[index])
+                    else:
+                        deferred.append(index)
+                        skipped.add(position)
+                running = {}
+
+            while next_position in results or next_position in skipped:
+                if next_position in results:
+                    keys.pop(indices[next_position], None)
+                    yield results.pop(next_position)
+                next_position += 1
+
+    def _completed(self, future: Future, file_path: Path, key: Optional[str], start: float) -> Dict:
+        """Features returned by a worker, cached and with its profile records merged"""
+        features, duration, records = future.result()
+        if records is not None:
+            self.profiler.merge(records)
+        self._finished(file_path, duration, start)
+        self._store(key, features)
+        return features
+
+    def _timed_out(self, index: int, task: Tuple[Path, str], attempts: Dict[int, int], start: float) -> bool:
+        """Record a file stopped at its time budget, False if it is to be retried with a larger one"""
+        file_path = task[0]
+        attempt = attempts.get(index, 0)
+        budget = self._budget(attempt)
+        self._finished(file_path, budget, start)
+        if attempt < self.retries:
+            attempts[index] = attempt + 1
+            self.retried.append(str(file_path))
+            logging.info(f"{file_path.name} exceeded its time budget of {budget:.1f} s, "
+                         f"retrying it after the other files with {self._budget(attempt + 1):.1f} s")
+            return False
+        logging.warning(f"{file_path.name} exceeded its time budget of {budget:.1f} s")
+        self.timed_out.append(str(file_path))
+        return True
+
+    def _timed_out_row(self, file_path: Path, label: str) -> Dict:
+        """Row of NaN features of a file that exceeded its time budget"""
+        empty_features = getattr(self.feature_extractor, "empty_features", None)
+        if empty_features is not None:
+            features = empty_features(file_path, label)
+        else:
+            template = getattr(self.feature_extractor, "feature_template", None) or {}
+            features = {"file": file_path.name, "label": label, **{name: np.nan for name in template}}
+        return {**features, "timed_out": True}
+
+    def _budget(self, attempt: int) -> Optional[float]:
+        """Time budget of the given retry of a file, None without a budget"""
+        if self.time_budget is None:
+            return None
+        return self.time_budget * self.retry_budget_factor ** attempt
+
+    def stats(self) -> Dict[str, float]:
+        """Per-file duration percentiles, timeouts and the tail of the last run
+
+        The tail is the time between the completion of 95% of the files and the
+        last one, i.e. how long stragglers kept the run going.
+        """
+        if not self.durations:
+            return {}
+        durations = np.array(list(self.durations.values()))
+        completion_times = np.array(self.completion_times)
+        return {
+            "extraction_files": len(durations),
+            "extraction_retried": len(self.retried),
+            "extraction_timed_out": len(self.timed_out),
+            "extraction_p50_s": float(np.percentile(durations, 50)),
+            "extraction_p95_s": float(np.percentile(durations, 95)),
+            "extraction_max_s": float(durations.max()),
+            "extraction_wall_s": float(completion_times.max()),
+            "extraction_tail_s": float(completion_times.max() - np.percentile(completion_times, 95)),
+        }
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class FeatureCache:
+    """Persistent, size-bounded cache of extracted features.
+
+    Entries are keyed by the SHA-256 of the audio file content together with the
+    extractor's analysis parameters, so renaming or moving a recording keeps its
+    entry valid while changing either the audio or the parameters invalidates it.
+    Entries are stored in a single SQLite file and evicted least-recently-used
+    first once the total size exceeds ``max_size_bytes``.
+    """
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int = 1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.cache_dir / "features.sqlite")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+        return self._connection
+
+    def key(self, file_path: Path, params: Dict) -> str:
+        """Build the cache key of an audio file for the given analysis parameters
+
+        Args:
+            file_path (Path): Path to the audio file
+            params (Dict): Parameters that determine the extracted values
+
+        Returns:
+            str: Hex digest identifying the file content and parameters
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self.connection.execute("SELECT value FROM features WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.connection:
+            self.connection.execute("UPDATE features SET last_access = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, key: str, features: Dict):
+        value = pickle.dumps(features, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO features (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+        self._evict()
+
+    def _evict(self):
+        total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM features").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+        with self.connection:
+            rows = self.connection.execute("SELECT key, size FROM features ORDER BY last_access").fetchall()
+            for key, size in rows:
+                if total_size <= self.max_size_bytes:
+                    break
+                self.connection.execute("DELETE FROM features WHERE key = ?", (key,))
+                total_size -= size
+                self.evictions += 1
+        logging.info(f"Feature cache evicted entries down to {total_size} bytes")
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters of this cache instance"""
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_evictions": self.evictions,
+        }
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+@dataclass(frozen=True)
+class FeatureGroup:
+    """Features computed together from the same Praat analysis.
+
+    ``compute`` receives the PraatAnalysis of a sound and returns the values
+    of the group's columns. A group is only computed when at least one of its
+    columns is in the features_template of the extractor, and then returns all
+    of them.
+    """
+    name: str
+    columns: Tuple[str, ...]
+    compute: Callable[["PraatAnalysis"], Dict]
+
+
+# Registered feature groups by name, in the order they are computed
+FEATURE_GROUPS: Dict[str, FeatureGroup] = {}
+
+
+def register_feature_group(name: str, columns: Iterable[str]):
+    """Decorator registering a function as the feature group ``name``, producing ``columns``
+
+    Example:
+        @register_feature_group("hnr", ["hnr_mean"])
+        def _hnr(analysis):
+            return {"hnr_mean": call(analysis.harmonicity, "Get mean", 0, 0)}
+    """
+    columns = tuple(columns)
+
+    def decorator(compute: Callable[["PraatAnalysis"], Dict]):
+        if name in FEATURE_GROUPS:
+            raise ValueError(f"Feature group {name} is already registered")
+        taken = {column: group.name for group in FEATURE_GROUPS.values() for column in group.columns}
+        clashes = {column: taken[column] for column in columns if column in taken}
+        if clashes:
+            raise ValueError(f"Columns of feature group {name} are produced by other groups: {clashes}")
+        FEATURE_GROUPS[name] = FeatureGroup(name, columns, compute)
+        return compute
+
+    return decorator
+
+
+def select_feature_groups(columns: Iterable[str]) -> List[FeatureGroup]:
+    """Feature groups producing at least one of the requested columns, in registration order
+
+    Raises:
+        ValueError: If a requested column is not produced by any registered group
+    """
+    columns = set(columns)
+    available = {column for group in FEATURE_GROUPS.values() for column in group.columns}
+    unknown = columns - available
+    if unknown:
+        raise ValueError(f"No feature group produces the columns {sorted(unknown)}. "
+                         f"Available columns: {', '.join(sorted(available))}")
+    return [group for group in FEATURE_GROUPS.values() if columns & set(group.columns)]
@@ -5,14 +5,31 @@ import pandas as pd
 import librosa
 import numpy as np
 from tqdm import tqdm
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from ml_project.components.preprocessing.audio_store import AudioStore
+from ml_project.components.preprocessing.pitch_engines import track_pitch, track_pitch_batch
+from ml_project.logging.profiler import StageProfiler
 from ml_project.src.interfaces import DataPreprocessor
 
 class LibrosaFeatureExtractor(DataPreprocessor):
     """Class to create and enrich the sentence dataset"""
-    def __init__(self, participant_info_path: str, sample_rate: int = 16000):
+    def __init__(self, participant_info_path: str, sample_rate: int = 16000, batch_size: int = 1,
+                 pitch_engine: str = "pyin", profiler: Optional[StageProfiler] = None,
+                 audio_store: Optional[AudioStore] = None):
         self.sample_rate = sample_rate
         self.participant_info_path = participant_info_path
+        # Number of files analysed together by multichannel librosa calls. 1 processes files one at a time.
+        # The onset envelopes are always batched, pitch only with the "yin" engine: "pyin" and
+        # the Praat engines still track each file on its own (see pitch_engines.track_pitch_batch).
+        self.batch_size = batch_size
+        self.pitch_engine = pitch_engine  # One of pitch_engines.PITCH_ENGINES
+        self.profiler = profiler or StageProfiler(enabled=False)
+        # Decoded audio read instead of the WAV files when it holds them at sample_rate
+        self.audio_store = audio_store
+        self.fmin = 10
+        self.fmax = 8000
+        self.frame_length = 1024
+        self.onset_hop_length = 512  # onset_strength default
         self.required_columns = [
             'file', 'gender', 'duration', 'words_per_second', 'tempo',
             'f0_mean', 'f0_median', 'f0_std', 'f0_5perc', 'f0_95perc'
@@ -26,7 +43,8 @@ class LibrosaFeatureExtractor(DataPreprocessor):
         logging.info("Creating base dataframe...")
         df = self._create_base_dataframe(raw_data)
         logging.info("Enriching with participant info...")
-        return self._enrich_with_participant_info(df)
+        with self.profiler.stage("librosa.join"):
+            return self._enrich_with_participant_info(df)
 
     def _process_audio_files(self, sentences_path: Path) -> Dict[str, list]:
         """Process all audio files and extract features"""
@@ -37,24 +55,127 @@ class LibrosaFeatureExtractor(DataPreprocessor):
         # Get all audio files in the sentences path
         files = [f for f in sentences_path.glob('*.wav') if f.is_file()]
 
+        if self.batch_size > 1:
+            self._process_audio_files_in_batches(files, data)
+            return data
+
         for file in tqdm(files, desc="Processing audio files"):
             try:
-                features = self._extract_features(file)
+                with self.profiler.stage("librosa.file"):
+                    features = self._extract_features(file)
                 self._store_features(data, file, features)
             except Exception as e:
                 logging.error(f"Error processing {file.name}: {str(e)}")
         
         return data
 
+    def _process_audio_files_in_batches(self, files: List[Path], data: Dict[str, list]):
+        """Process audio files in batches and store their features in the original file order
+
+        Args:
+            files (List[Path]): Audio files to process
+            data (Dict[str, list]): Dictionary to store the features
+        """
+        # Batching files of similar size together keeps the zero padding, and the pyin work spent on it, small
+        files_by_size = sorted(files, key=lambda f: f.stat().st_size)
+        features = {}
+        for start in tqdm(range(0, len(files_by_size), self.batch_size), desc="Processing audio batches"):
+            batch = files_by_size[start:start + self.batch_size]
+            try:
+                with self.profiler.stage("librosa.batch"):
+                    features.update(zip(batch, self._extract_batch_features(batch)))
+            except Exception as e:
+                logging.error(f"Error processing batch, retrying its files one at a time: {str(e)}")
+                for file in batch:
+                    try:
+                        with self.profiler.stage("librosa.file"):
+                            features[file] = self._extract_features(file)
+                    except Exception as e:
+                        logging.error(f"Error processing {file.name}: {str(e)}")
+
+        for file in files:
+            if file in features:
+                self._store_features(data, file, features[file])
+
+    def _extract_batch_features(self, files: List[Path]) -> List[Dict[str, Any]]:
+        """Extract audio features of several files with multichannel librosa calls
+
+        The signals are zero padded into a (n_files, n_samples) array. Pitch is tracked
+        with track_pitch_batch, which only batches the yin engine, the onset envelopes
+        are computed with per-file dB scaling and cut at each file's own length, so the
+        features match the ones of _extract_features (see tools/check_librosa_batch_parity.py).
+
+        Args:
+            files (List[Path]): Audio files of the batch
+
+        Returns:
+            List[Dict[str, Any]]: Extracted features of each file, in input order
+        """
+        logging.info(f"Extracting features from a batch of {len(files)} files")
+        with self.profiler.stage("librosa.decode"):
+            signals = [self._load(file) for file in files]
+        lengths = np.array([len(y) for y in signals])
+        batch = np.zeros((len(signals), lengths.max()), dtype=np.float32)
+        for i, y in enumerate(signals):
+            batch[i, :len(y)] = y
+
+        with self.profiler.stage("librosa.pitch_batch"):
+            f0 = track_pitch_batch(signals, self.sample_rate, self.pitch_engine, self.fmin, self.fmax,
+                                   frame_length=self.frame_length)
+        f0_5perc, f0_median, f0_95perc = np.nanpercentile(f0, [5, 50, 95], axis=1)
+
+        with self.profiler.stage("librosa.onset_batch"):
+            onset_envelopes = self._onset_envelopes(batch)
+        n_onset_frames = 1 + lengths // self.onset_hop_length
+
+        durations = lengths / self.sample_rate
+        f0_mean = np.nanmean(f0, axis=1)
+        f0_std = np.nanstd(f0, axis=1)
+        return [
+            {
+                'duration': durations[i],
+                'words_per_second': 6 / durations[i],  # Fixed sentence structure. Speakers always pronounce 6 words in the audio
+                'tempo': self._tempo(onset_envelopes[i, :n_onset_frames[i]]),
+                'f0_mean': f0_mean[i],
+                'f0_median': f0_median[i],
+                'f0_std': f0_std[i],
+                'f0_5perc': f0_5perc[i],
+                'f0_95perc': f0_95perc[i]
+            }
+            for i in range(len(files))
+        ]
+
+    def _onset_envelopes(self, batch: np.ndarray) -> np.ndarray:
+        """Onset strength of every row of a zero padded batch, as onset_strength computes it for one signal
+
+        The mel spectrograms are computed with one multichannel call, but converted
+        to dB row by row: power_to_db clips at 80 dB below the maximum of its whole
+        input, which for the batch would be the loudest file.
+        """
+        mel = librosa.feature.melspectrogram(y=batch, sr=self.sample_rate, hop_length=self.onset_hop_length)
+        mel_db = np.stack([librosa.power_to_db(m) for m in mel])
+        return librosa.onset.onset_strength(S=mel_db, sr=self.sample_rate, hop_length=self.onset_hop_length,
+                                            aggregate=np.median)
+
+    def _tempo(self, onset_envelope: np.ndarray) -> np.ndarray:
+        """Tempo of an onset envelope, as beat_track estimates it (0 without any onset)"""
+        if not onset_envelope.any():
+            return np.zeros(1)
+        return librosa.feature.tempo(onset_envelope=onset_envelope, sr=self.sample_rate,
+                                     hop_length=self.onset_hop_length)
+
     def _extract_features(self, file_path: Path) -> Dict[str, Any]:
         """Extract audio features using Librosa"""
         logging.info(f"Extracting features from {file_path.name}")
-        y, sr = librosa.load(file_path, sr=self.sample_rate)
+        with self.profiler.stage("librosa.decode"):
+            y, sr = self._load(file_path), self.sample_rate
         
         duration = len(y) / sr
         words_per_second = 6 / duration  # Fixed sentence structure. Speakers always pronounce 6 words in the audio
-        tempo = librosa.beat.beat_track(y=y, sr=sr)[0]
-        f0 = librosa.pyin(y, sr=sr, fmin=10, fmax=8000, frame_length=1024)[0]
+        with self.profiler.stage("librosa.tempo"):
+            tempo = librosa.beat.beat_track(y=y, sr=sr)[0]
+        with self.profiler.stage("librosa.pitch"):
+            f0 = track_pitch(y, sr, self.pitch_engine, self.fmin, self.fmax, frame_length=self.frame_length)
 
         return {
             'duration': duration,
@@ -67,6 +188,14 @@ class LibrosaFeatureExtractor(DataPreprocessor):
             'f0_95perc': np.nanpercentile(f0, 95)
         }
 
+    def _load(self, file_path: Path) -> np.ndarray:
+        """Samples of a file at sample_rate, from the audio store when it holds them"""
+        if self.audio_store is not None:
+            y = self.audio_store.get(file_path, self.sample_rate)
+            if y is not None:
+                return y
+        return librosa.load(file_path, sr=self.sample_rate)[0]
+
     def _store_features(self, data: Dict[str, list], file: Path, features: Dict[str, Any]):
         """Store extracted features in the data dictionary
         
@@ -1,53 +1,116 @@
+import logging
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, Optional, Tuple
 
 import librosa
 import numpy as np
 
+from ml_project.components.preprocessing.audio_store import AudioStore
+from ml_project.components.preprocessing.mel_spectrogram_store import MelSpectrogramStore
 from ml_project.src.interfaces import FeatureExtractor
 
 
 class MelFeatureExtractor(FeatureExtractor):
     """Mel spectrogram feature extractor extending base class"""
-    
-    def __init__(self, sample_rate: int = 16000, 
+
+    def __init__(self, sample_rate: int = 16000,
                  max_duration: float = 3.0,
-                 hop_length: int = 512):
+                 hop_length: int = 512,
+                 n_mels: int = 128,
+                 exclude_segments: bool = False,
+                 audio_store: Optional[AudioStore] = None):
         """Initialize MelFeatureExtractor"""
-        super().__init__(sample_rate)
+        self.sample_rate = sample_rate
         self.max_duration = max_duration
         self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.exclude_segments = exclude_segments
+        # Decoded audio read instead of the WAV files when it holds them at sample_rate
+        self.audio_store = audio_store
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def n_frames(self) -> int:
+        """Number of frames every spectrogram is padded or truncated to"""
+        return int(self.max_duration * self.sample_rate / self.hop_length)
 
-    def extract_features(self, file_path: Path) -> Dict:
+    def extract_features(self, file_path: Path, label: str = None) -> Dict:
         """Extract Mel spectrogram features"""
-        features = {}
+        features = {"file": file_path.name, "label": label}
         audio_data = self._safe_load_audio(file_path)
-        
+
         if audio_data:
             y, sr = audio_data
             features.update(self._compute_mel_features(y, sr))
-            
+
         return features
 
-    def _compute_mel_features(self, y: np.ndarray, sr: int) -> Dict:
-        """Compute Mel-specific features"""
+    def extract_to_store(self, tasks: Iterable[Tuple[Path, str]], store_path: Path) -> MelSpectrogramStore:
+        """Write the spectrograms of many files into one memory-mapped float32 array
+
+        Each spectrogram is written straight into the next row of the
+        (n_files, n_mels, n_frames) array instead of being kept in memory.
+        Files that fail to load or analyse are skipped, and the array is
+        truncated to the rows written, so row i of the array is entry i of the
+        index and its labels.
+
+        Args:
+            tasks (Iterable[Tuple[Path, str]]): Audio files and their labels
+            store_path (Path): Path of the store, without suffix
+
+        Returns:
+            MelSpectrogramStore: The written store, opened read-only
+        """
+        tasks = list(tasks)
+        spectrograms = MelSpectrogramStore.create(store_path, len(tasks), self.n_mels, self.n_frames)
+        index = []
+        for file_path, label in tasks:
+            audio_data = self._safe_load_audio(file_path)
+            if not audio_data:
+                continue
+            mel_db = self._compute_mel_db(*audio_data)
+            if mel_db is None:
+                continue
+            spectrograms[len(index)] = self._resize_spectrogram(mel_db, self.n_frames)
+            index.append({"file": file_path.name, "row": len(index), "label": label})
+        spectrograms.flush()
+        del spectrograms
+        MelSpectrogramStore.truncate(store_path, len(index))
+        return MelSpectrogramStore.write_index(store_path, index)
+
+    def _safe_load_audio(self, file_path: Path) -> Optional[Tuple[np.ndarray, int]]:
+        """Load audio resampled to the extractor sample rate, or None if the file cannot be read"""
+        if self.audio_store is not None:
+            y = self.audio_store.get(file_path, self.sample_rate)
+            if y is not None:
+                return y, self.sample_rate
+        try:
+            return librosa.load(file_path, sr=self.sample_rate)
+        except Exception as e:
+            self.logger.error(f"Error loading {file_path.name}: {str(e)}")
+            return None
+
+    def _compute_mel_db(self, y: np.ndarray, sr: int) -> Optional[np.ndarray]:
         try:
             mel_spec = librosa.feature.melspectrogram(
-                y=y, sr=sr
+                y=y, sr=sr, hop_length=self.hop_length, n_mels=self.n_mels
             )
-            mel_db = librosa.power_to_db(mel_spec, ref=np.max)
-
-            # Estimate the desired length of the spectrogram
-            length = int(self.max_duration * sr / self.hop_length)
-            
-            return {
-                "mel_spectrogram": self._resize_spectrogram(mel_db, length), # Put mel spectrogram into the right shape
-                "mel_strength": np.mean(mel_db, axis=1), # Compute mean strength per frequency for mel spectrogram
-            }
+            return librosa.power_to_db(mel_spec, ref=np.max)
         except Exception as e:
             self.logger.error(f"Mel feature error: {str(e)}")
+            return None
+
+    def _compute_mel_features(self, y: np.ndarray, sr: int) -> Dict:
+        """Compute Mel-specific features"""
+        mel_db = self._compute_mel_db(y, sr)
+        if mel_db is None:
             return {}
 
+        return {
+            "mel_spectrogram": self._resize_spectrogram(mel_db, self.n_frames), # Put mel spectrogram into the right shape
+            "mel_strength": np.mean(mel_db, axis=1), # Compute mean strength per frequency for mel spectrogram
+        }
+
     def _resize_spectrogram(self, spec: np.ndarray, length: int, factor: float = -80.0) -> np.ndarray:
         """Resize spectrogram to fixed duration"""
         # Create an empty canvas to put spectrogram into
@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class MelSpectrogramStore:
+    """Mel spectrograms of a dataset stored as one memory-mapped array.
+
+    The spectrograms live in ``<path>.npy`` as a float32 array of shape
+    ``(n_files, n_mels, n_frames)``, and ``<path>.index.csv`` maps each file to
+    its row and label. Reading a slice of ``spectrograms`` only pages in the
+    rows it touches, so training code can iterate over thousands of
+    spectrograms without holding them in memory.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.spectrograms = np.load(self.array_path(self.path), mmap_mode="r")
+        self.index = pd.read_csv(self.index_path(self.path))
+        self._rows = dict(zip(self.index["file"], self.index["row"]))
+
+    @staticmethod
+    def array_path(path: Path) -> Path:
+        return path.with_name(path.name + ".npy")
+
+    @staticmethod
+    def index_path(path: Path) -> Path:
+        return path.with_name(path.name + ".index.csv")
+
+    @classmethod
+    def create(cls, path: Path, n_files: int, n_mels: int, n_frames: int) -> np.memmap:
+        """Allocate the memory-mapped array of a new store
+
+        Args:
+            path (Path): Path of the store, without suffix
+            n_files (int): Number of spectrograms
+            n_mels (int): Number of mel bands
+            n_frames (int): Number of frames of every spectrogram
+
+        Returns:
+            np.memmap: Writable array of shape (n_files, n_mels, n_frames)
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return np.lib.format.open_memmap(
+            cls.array_path(path), mode="w+", dtype=np.float32, shape=(n_files, n_mels, n_frames)
+        )
+
+    @classmethod
+    def truncate(cls, path: Path, n_files: int, chunk_size: int = 256):
+        """Keep only the first n_files rows of the array of a store, e.g. when fewer files were written
+
+        The rows are copied chunk by chunk into a new array that replaces the old one.
+        """
+        array = np.load(cls.array_path(path), mmap_mode="r")
+        if len(array) == n_files:
+            return
+        tmp_path = path.with_name(path.name + ".tmp")
+        truncated = cls.create(tmp_path, n_files, *array.shape[1:])
+        for start in range(0, n_files, chunk_size):
+            end = min(start + chunk_size, n_files)
+            truncated[start:end] = array[start:end]
+        truncated.flush()
+        del truncated, array
+        os.replace(cls.array_path(tmp_path), cls.array_path(path))
+
+    @classmethod
+    def write_index(cls, path: Path, index: List[Dict]) -> "MelSpectrogramStore":
+        """Write the file -> row index of a store and open it"""
+        pd.DataFrame(index, columns=["file", "row", "label"]).to_csv(cls.index_path(path), index=False)
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, file: str) -> np.ndarray:
+        """Read-only view of the spectrogram of a file"""
+        return self.spectrograms[self._rows[file]]
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self.index["label"].to_numpy()
@@ -0,0 +1,108 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import opensmile
+
+from ml_project.components.preprocessing.audio_store import AudioStore
+from ml_project.logging.profiler import StageProfiler
+from ml_project.src.interfaces import FeatureExtractor
+
+
+class OpenSmileFeatureExtractor(FeatureExtractor):
+    """Functionals of an openSMILE feature set, 88 eGeMAPSv02 features by default.
+
+    ``extract_batch`` hands whole batches of files to openSMILE's own multi-file
+    processing, which analyses ``num_workers`` files at a time in native threads.
+    The ExtractionExecutor uses it instead of ``extract_features`` and does not
+    start worker processes for this extractor.
+    """
+
+    def __init__(self, exclude_segments: bool = False, feature_set: str = "eGeMAPSv02",
+                 feature_level: str = "Functionals", num_workers: int = 1, batch_size: int = 256,
+                 audio_store: Optional[AudioStore] = None, profiler: Optional[StageProfiler] = None):
+        self.exclude_segments = exclude_segments
+        self.feature_set = feature_set
+        self.feature_level = feature_level
+        self.num_workers = num_workers
+        # Number of files passed to one openSMILE process_files call
+        self.batch_size = batch_size
+        # Decoded audio analysed instead of the WAV files, see _process
+        self.audio_store = audio_store
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.smile = opensmile.Smile(
+            feature_set=opensmile.FeatureSet[feature_set],
+            feature_level=opensmile.FeatureLevel[feature_level],
+            num_workers=num_workers,
+        )
+        # NaN row of the output columns, used for files that fail
+        self.feature_template = {name: np.nan for name in self.smile.feature_names}
+
+    @property
+    def analysis_params(self) -> Dict:
+        """Parameters that determine the extracted values, used to key cached features"""
+        return {
+            "feature_set": self.feature_set,
+            "feature_level": self.feature_level,
+            "opensmile": opensmile.__version__,
+            # Decoded samples are mono float32, openSMILE reads the first channel of the file, and
+            # they are analysed at the rate the store resampled them to
+            **({"audio_store": self.audio_store.requested_rate or "native"} if self.audio_store is not None else {}),
+        }
+
+    def extract_features(self, file_path: Path, label: str) -> Dict:
+        return self.extract_batch([(file_path, label)])[0]
+
+    def extract_batch(self, tasks: List[Tuple[Path, str]]) -> List[Dict]:
+        """Features of every (file_path, label) task, in input order
+
+        If openSMILE fails on a batch, its files are processed one at a time so
+        only the failing ones get NaN features.
+        """
+        features = []
+        for start in range(0, len(tasks), self.batch_size):
+            batch = tasks[start:start + self.batch_size]
+            try:
+                with self.profiler.stage("opensmile.batch"):
+                    values = self._process([file_path for file_path, _ in batch])
+            except Exception as e:
+                logging.error(f"Error processing a batch of {len(batch)} files, retrying them one by one: {str(e)}")
+                values = [self._process_single(file_path) for file_path, _ in batch]
+            features.extend({"file": file_path.name, "label": label, **row}
+                            for (file_path, label), row in zip(batch, values))
+        return features
+
+    def _process_single(self, file_path: Path) -> Dict:
+        try:
+            with self.profiler.stage("opensmile.file"):
+                return self._process([file_path])[0]
+        except Exception as e:
+            logging.error(f"Error processing {file_path.name}: {str(e)}")
+            return self.feature_template.copy()
+
+    def _process(self, file_paths: List[Path]) -> List[Dict]:
+        """Feature values of each file, read from the audio store when it holds the file
+
+        Like the files openSMILE reads itself, the stored signals are processed
+        ``num_workers`` at a time in threads; openSMILE releases the GIL while
+        it analyses a signal.
+        """
+        signals = {}
+        if self.audio_store is not None:
+            for file_path in file_paths:
+                samples = self.audio_store.get(file_path)
+                if samples is not None:
+                    signals[file_path] = (samples, self.audio_store.sample_rate(file_path))
+        values = {}
+        if signals:
+            with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+                dfs = pool.map(lambda signal: self.smile.process_signal(*signal), signals.values())
+                values.update((file_path, df.iloc[0].to_dict()) for file_path, df in zip(signals, dfs))
+        remaining = [file_path for file_path in file_paths if file_path not in values]
+        if remaining:
+            # One row per file, in the order of the files
+            df = self.smile.process_files([str(file_path) for file_path in remaining])
+            values.update(zip(remaining, df.to_dict("records")))
+        return [values[file_path] for file_path in file_paths]
@@ -0,0 +1,101 @@
+import hashlib
+import logging
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from ml_project.components.preprocessing.row_lookup import RowLookup
+
+# Parsed tables shared by every ParticipantMetadata of the process, keyed like the on-disk cache
+_parsed_tables: Dict[str, pd.DataFrame] = {}
+
+
+class ParticipantMetadata:
+    """Evaluation and participant metadata shared by the dataset creators.
+
+    DATA_GEFAV_EVAL.CSV and the participant CSV are parsed once, with the
+    sample_name normalisation applied, and cached as pickles keyed by the path,
+    size and mtime of the source file. The tables can be merged in bulk or
+    looked up in O(1) per sample_name / participant during streaming extraction.
+    """
+
+    def __init__(self, eval_path: Path, participant_path: Path, cache_dir: Optional[Path] = None):
+        self.eval_path = Path(eval_path)
+        self.participant_path = Path(participant_path)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+    @cached_property
+    def eval_data(self) -> pd.DataFrame:
+        return self._load(self.eval_path, self._parse_eval_data)
+
+    @cached_property
+    def participant_data(self) -> pd.DataFrame:
+        return self._load(self.participant_path, self._parse_participant_data)
+
+    @cached_property
+    def eval_lookup(self) -> RowLookup:
+        return RowLookup(self.eval_data, 'sample_name')
+
+    @cached_property
+    def _participant_lookups(self) -> Dict[str, RowLookup]:
+        return {}
+
+    def participant_lookup(self, on: str) -> RowLookup:
+        """Lookup of the participant data by participant id, joined on the given row column"""
+        if on not in self._participant_lookups:
+            self._participant_lookups[on] = RowLookup(self._participant_data_on(on), on)
+        return self._participant_lookups[on]
+
+    def enrich_with_eval_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        return pd.merge(df, self.eval_data, on='sample_name', how='left')
+
+    def enrich_with_participant_data(self, df: pd.DataFrame, on: str) -> pd.DataFrame:
+        return pd.merge(df, self._participant_data_on(on), on=on, how='left')
+
+    def join_row(self, row: Dict, participant_on: str) -> List[Dict]:
+        """Join one extracted row with its evaluation and participant data, like the bulk merges do"""
+        rows = []
+        for row_with_eval in self.eval_lookup.join(row):
+            rows.extend(self.participant_lookup(participant_on).join(row_with_eval))
+        return rows
+
+    def _participant_data_on(self, on: str) -> pd.DataFrame:
+        participant_df = self.participant_data.copy()
+        participant_df[on] = participant_df['Participant']
+        return participant_df
+
+    @staticmethod
+    def _parse_eval_data(path: Path) -> pd.DataFrame:
+        eval_df = pd.read_csv(path, sep='\t')
+        eval_df['sample_name'] = eval_df['SEX'] + '-' + eval_df['DONOR'].astype(str)
+        eval_df['sample_name'] = eval_df['sample_name'].replace({r'^FO': 'F', r'^H': 'M'}, regex=True)
+        return eval_df
+
+    @staticmethod
+    def _parse_participant_data(path: Path) -> pd.DataFrame:
+        participant_df = pd.read_csv(path)[['Participant', 'Age', 'Sex']]
+        # Make sure participant age is numeric
+        participant_df['Age'] = pd.to_numeric(participant_df['Age'], errors='coerce')
+        return participant_df
+
+    def _load(self, path: Path, parse: Callable[[Path], pd.DataFrame]) -> pd.DataFrame:
+        stat = path.stat()
+        key = hashlib.sha256(
+            f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{parse.__name__}".encode()
+        ).hexdigest()
+        if key in _parsed_tables:
+            return _parsed_tables[key]
+
+        cache_path = self.cache_dir / f"{path.stem}-{key[:16]}.pkl" if self.cache_dir else None
+        if cache_path is not None and cache_path.exists():
+            df = pd.read_pickle(cache_path)
+        else:
+            logging.info(f"Parsing metadata file {path}")
+            df = parse(path)
+            if cache_path is not None:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                df.to_pickle(cache_path)
+        _parsed_tables[key] = df
+        return df
@@ -0,0 +1,160 @@
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import librosa
+import numpy as np
+import pandas as pd
+import parselmouth
+
+# Pitch trackers selectable by the feature extractors, roughly from most to least expensive.
+# "pyin" and "yin" come from librosa, "praat_ac" and "praat_cc" are Praat's autocorrelation
+# ("To Pitch") and cross-correlation ("To Pitch (cc)") methods.
+PITCH_ENGINES = ("pyin", "yin", "praat_ac", "praat_cc")
+LIBROSA_ENGINES = ("pyin", "yin")
+
+
+def _check_engine(engine: str):
+    if engine not in PITCH_ENGINES:
+        raise ValueError(f"Unknown pitch engine: {engine}. Available engines: {', '.join(PITCH_ENGINES)}")
+
+
+def track_pitch_with_times(y: np.ndarray, sr: int, engine: str, fmin: float, fmax: float,
+                           frame_length: int = 2048) -> Tuple[np.ndarray, np.ndarray]:
+    """Estimate the F0 contour of a mono signal
+
+    Args:
+        y (np.ndarray): Audio signal
+        sr (int): Sample rate of the signal
+        engine (str): One of PITCH_ENGINES
+        fmin (float): Lowest F0 considered, in Hz
+        fmax (float): Highest F0 considered, in Hz
+        frame_length (int): Analysis frame length of the librosa engines, in samples
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Frame times in seconds and F0 in Hz, NaN on unvoiced frames
+    """
+    _check_engine(engine)
+    if engine in LIBROSA_ENGINES:
+        f0 = _track_librosa(y, sr, engine, fmin, fmax, frame_length)
+        return librosa.times_like(f0, sr=sr, hop_length=frame_length // 4), f0
+
+    sound = parselmouth.Sound(np.asarray(y, dtype=np.float64), sampling_frequency=sr)
+    if engine == "praat_cc":
+        pitch = sound.to_pitch_cc(pitch_floor=fmin, pitch_ceiling=fmax)
+    else:
+        pitch = sound.to_pitch_ac(pitch_floor=fmin, pitch_ceiling=fmax)
+    f0 = pitch.selected_array['frequency']
+    return pitch.xs(), np.where(f0 > 0, f0, np.nan)
+
+
+def track_pitch(y: np.ndarray, sr: int, engine: str, fmin: float, fmax: float,
+                frame_length: int = 2048) -> np.ndarray:
+    """F0 contour of a mono signal, NaN on unvoiced frames. See track_pitch_with_times."""
+    return track_pitch_with_times(y, sr, engine, fmin, fmax, frame_length)[1]
+
+
+def track_pitch_batch(signals: List[np.ndarray], sr: int, engine: str, fmin: float, fmax: float,
+                      frame_length: int = 2048) -> np.ndarray:
+    """F0 contours of several signals as one NaN padded (n_signals, n_frames) array
+
+    yin estimates every frame on its own, so it analyses the zero padded signals with a
+    single multichannel call and masks the frames past the end of each signal. Only yin is
+    batched: pyin decodes the voicing of all the frames of a signal at once, so padding or
+    cutting the signal into chunks would change its contour, and Praat's frame layout
+    depends on the signal duration. Both track each signal on its own. Every contour is the
+    one track_pitch computes for the signal alone.
+    """
+    _check_engine(engine)
+    lengths = np.array([len(y) for y in signals])
+    if engine == "yin":
+        batch = np.zeros((len(signals), lengths.max()), dtype=np.float32)
+        for i, y in enumerate(signals):
+            batch[i, :len(y)] = y
+        f0 = _track_librosa(batch, sr, engine, fmin, fmax, frame_length)
+        n_frames = 1 + lengths // (frame_length // 4)
+        f0[np.arange(f0.shape[-1]) >= n_frames[:, None]] = np.nan
+        return f0
+
+    contours = [track_pitch(y, sr, engine, fmin, fmax, frame_length) for y in signals]
+    f0 = np.full((len(contours), max(len(c) for c in contours)), np.nan)
+    for i, contour in enumerate(contours):
+        f0[i, :len(contour)] = contour
+    return f0
+
+
+def _track_librosa(y: np.ndarray, sr: int, engine: str, fmin: float, fmax: float, frame_length: int) -> np.ndarray:
+    if engine == "pyin":
+        return librosa.pyin(y, sr=sr, fmin=fmin, fmax=fmax, frame_length=frame_length)[0]
+    # yin has no voicing decision, every frame gets an F0 estimate
+    return librosa.yin(y, sr=sr, fmin=fmin, fmax=fmax, frame_length=frame_length)
+
+
+def compare_pitch_engines(files: Iterable[Path], engines: Iterable[str] = PITCH_ENGINES,
+                          reference: str = "pyin", sample_rate: int = 16000,
+                          fmin: float = 75, fmax: float = 600) -> pd.DataFrame:
+    """Time every pitch engine on each file and measure its F0 deviation from a reference engine
+
+    Frame-level deviations are measured in cents on the frames voiced in both contours, after
+    mapping each frame of the engine to the nearest reference frame.
+
+    Args:
+        files (Iterable[Path]): Audio files to analyse
+        engines (Iterable[str]): Engines to compare
+        reference (str): Engine used as ground truth
+        sample_rate (int): Sample rate the files are loaded at
+        fmin (float): Lowest F0 considered, in Hz
+        fmax (float): Highest F0 considered, in Hz
+
+    Returns:
+        pd.DataFrame: One row per file and engine
+    """
+    engines = list(dict.fromkeys([reference, *engines]))
+    rows = []
+    for file in files:
+        y, sr = librosa.load(file, sr=sample_rate)
+        contours = {}
+        for engine in engines:
+            start = time.perf_counter()
+            try:
+                contours[engine] = track_pitch_with_times(y, sr, engine, fmin, fmax)
+            except Exception as e:
+                logging.error(f"Error tracking pitch of {file.name} with {engine}: {str(e)}")
+                continue
+            runtime = time.perf_counter() - start
+            times, f0 = contours[engine]
+            rows.append({
+                "file": file.name,
+                "engine": engine,
+                "runtime_s": runtime,
+                "f0_mean": np.nanmean(f0) if np.any(~np.isnan(f0)) else np.nan,
+                "voiced_fraction": np.mean(~np.isnan(f0)) if len(f0) else np.nan,
+                **_deviation_from_reference(contours.get(reference), (times, f0)),
+            })
+    return pd.DataFrame(rows)
+
+
+def _deviation_from_reference(reference: Tuple[np.ndarray, np.ndarray], contour: Tuple[np.ndarray, np.ndarray]) -> Dict:
+    deviation = {"f0_mean_deviation_hz": np.nan, "f0_median_deviation_cents": np.nan, "gross_error_rate": np.nan}
+    if reference is None or len(reference[0]) == 0 or len(contour[0]) == 0:
+        return deviation
+
+    reference_times, reference_f0 = reference
+    times, f0 = contour
+    following = np.clip(np.searchsorted(reference_times, times), 0, len(reference_times) - 1)
+    preceding = np.maximum(following - 1, 0)
+    nearest = np.where(times - reference_times[preceding] < reference_times[following] - times, preceding, following)
+    aligned_reference = reference_f0[nearest]
+    both_voiced = ~np.isnan(f0) & ~np.isnan(aligned_reference)
+    if not both_voiced.any():
+        return deviation
+
+    cents = 1200 * np.abs(np.log2(f0[both_voiced] / aligned_reference[both_voiced]))
+    deviation.update({
+        "f0_mean_deviation_hz": abs(np.nanmean(f0) - np.nanmean(reference_f0)),
+        "f0_median_deviation_cents": np.median(cents),
+        # Share of jointly voiced frames off by more than half a semitone
+        "gross_error_rate": np.mean(cents > 50),
+    })
+    return deviation
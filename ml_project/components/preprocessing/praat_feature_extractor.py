@@ -5,25 +5,290 @@ from parselmouth.praat import call # type: ignore
 import pandas as pd
 import numpy as np
 
-from typing import Dict
+from functools import cached_property
+from typing import Dict, List, Optional
 
+from ml_project.components.preprocessing.audio_store import AudioStore
+from ml_project.components.preprocessing.contour_store import CONTOURS_KEY
+from ml_project.components.preprocessing.feature_groups import register_feature_group, select_feature_groups
+from ml_project.components.preprocessing.pitch_engines import LIBROSA_ENGINES, PITCH_ENGINES, track_pitch
+from ml_project.components.preprocessing.segment_boundaries import (
+    FULL_RECORDING, SEGMENTS_KEY, SegmentBoundaries, slice_segments
+)
+from ml_project.logging.profiler import StageProfiler
 from ml_project.src.interfaces import FeatureExtractor
 
+
+class PraatAnalysis:
+    """Praat objects of one sound, shared by every feature group.
+
+    Each object is built lazily the first time a feature group needs it and then
+    reused, so e.g. the PointProcess used for jitter and shimmer is derived from
+    the existing Pitch instead of running a second periodicity analysis.
+    """
+
+    def __init__(self, sound: parselmouth.Sound, extractor: "PraatFeatureExtractor"):
+        self.sound = sound
+        self.extractor = extractor
+
+    @cached_property
+    def pitch(self):
+        # The librosa pitch engines only provide the F0 contour, the PointProcess still needs a Praat Pitch
+        if self.extractor.pitch_engine == "praat_cc":
+            if self.extractor.backend == "numpy":
+                return self.sound.to_pitch_cc(pitch_floor=self.extractor.pitch_floor,
+                                              pitch_ceiling=self.extractor.pitch_ceiling)
+            return call(self.sound, "To Pitch (cc)", 0.0, self.extractor.pitch_floor, 15, "no",
+                        0.03, 0.45, 0.01, 0.35, 0.14, self.extractor.pitch_ceiling)
+        if self.extractor.backend == "numpy":
+            return self.sound.to_pitch(pitch_floor=self.extractor.pitch_floor,
+                                       pitch_ceiling=self.extractor.pitch_ceiling)
+        return call(self.sound, "To Pitch", 0.0, self.extractor.pitch_floor, self.extractor.pitch_ceiling)
+
+    @cached_property
+    def f0_contour(self) -> np.ndarray:
+        """F0 of every frame of the selected pitch engine, NaN on unvoiced frames"""
+        if self.extractor.pitch_engine in LIBROSA_ENGINES:
+            return track_pitch(self.sound.values.mean(axis=0), int(self.sound.sampling_frequency),
+                               self.extractor.pitch_engine, self.extractor.pitch_floor, self.extractor.pitch_ceiling)
+        frequencies = self.pitch.selected_array['frequency']
+        return np.where(frequencies > 0, frequencies, np.nan)
+
+    @cached_property
+    def formant(self):
+        if self.extractor.backend == "numpy":
+            return self.sound.to_formant_burg(max_number_of_formants=self.extractor.max_formants,
+                                              maximum_formant=self.extractor.formant_ceiling,
+                                              window_length=self.extractor.formant_window,
+                                              pre_emphasis_from=self.extractor.pre_emphasis)
+        return call(self.sound, "To Formant (burg)", 0.0, self.extractor.max_formants,
+                    self.extractor.formant_ceiling, self.extractor.formant_window, self.extractor.pre_emphasis)
+
+    @cached_property
+    def intensity(self):
+        if self.extractor.backend == "numpy":
+            return self.sound.to_intensity(minimum_pitch=self.extractor.pitch_floor, subtract_mean=True)
+        # Add third argument for 'subtract mean' (Praat requires 3 parameters)
+        return call(self.sound, "To Intensity", self.extractor.pitch_floor, 0.0, "yes")
+
+    @cached_property
+    def point_process(self):
+        # Same result as "To PointProcess (periodic, cc)", which recomputes the pitch internally
+        return call([self.sound, self.pitch], "To PointProcess (cc)")
+
+    @cached_property
+    def harmonicity(self):
+        return call(self.sound, "To Harmonicity (cc)", 0.01, self.extractor.pitch_floor, 0.1, 1.0)
+
+    @cached_property
+    def power_cepstrogram(self):
+        return call(self.sound, "To PowerCepstrogram", self.extractor.pitch_floor, 0.002, 5000, 50)
+
+    @cached_property
+    def ltas(self):
+        return call(self.sound, "To Ltas", 100)
+
+    def contours(self) -> Dict:
+        """Frame-level F0, F1-F3 and intensity contours and their time steps, for the contour store"""
+        if self.extractor.pitch_engine in LIBROSA_ENGINES:
+            # Hop length of track_pitch with its default 2048 samples frame length
+            f0_step = 512 / self.sound.sampling_frequency
+        else:
+            f0_step = self.pitch.dx
+        contours = {"f0": self.f0_contour, "f0_step": f0_step}
+        for i, track in enumerate(_formant_tracks(self.formant), start=1):
+            contours[f"f{i}"] = track
+            contours[f"f{i}_step"] = self.formant.dx
+        contours["intensity"] = self.intensity.values[0]
+        contours["intensity_step"] = self.intensity.dx
+        return contours
+
+
+def _pitch_statistics(f0: np.ndarray) -> Dict:
+    """Mean, median and standard deviation of the voiced frames, as Praat's "Get ..." commands compute them"""
+    voiced = f0[~np.isnan(f0)]
+    return {
+        "f0_mean": voiced.mean() if len(voiced) else np.nan,
+        # Praat interpolates quantiles at position n * q + 0.5, i.e. the "hazen" method
+        "f0_median": np.percentile(voiced, 50, method="hazen") if len(voiced) else np.nan,
+        "f0_std": voiced.std(ddof=1) if len(voiced) > 1 else np.nan
+    }
+
+
+def _formant_tracks(formant: parselmouth.Formant, n_formants: int = 3) -> np.ndarray:
+    """Frequency of the first formants at every frame, NaN where a formant is undefined"""
+    # One "To Matrix" call per formant instead of one query per frame. Frames without
+    # the formant hold 0 Hz in the matrix.
+    tracks = np.array([
+        call(formant, "To Matrix", i).values[0]
+        for i in range(1, n_formants + 1)
+    ]).reshape(n_formants, formant.n_frames)
+    return np.where(tracks > 0, tracks, np.nan)
+
+
+def _formant_means(formant: parselmouth.Formant, n_formants: int = 3) -> np.ndarray:
+    """Mean frequency of the first formants over the frames where each formant is defined"""
+    values = _formant_tracks(formant, n_formants)
+    defined = ~np.isnan(values)
+    counts = defined.sum(axis=1)
+    sums = np.where(defined, values, 0.0).sum(axis=1)
+    return np.divide(sums, counts, out=np.full(n_formants, np.nan), where=counts > 0)
+
+
+@register_feature_group("pitch", ["f0_mean", "f0_median", "f0_std"])
+def _pitch_features(analysis: PraatAnalysis) -> Dict:
+    if analysis.extractor.backend == "numpy" or analysis.extractor.pitch_engine in LIBROSA_ENGINES:
+        return _pitch_statistics(analysis.f0_contour)
+    pitch = analysis.pitch
+    return {
+        "f0_mean": call(pitch, "Get mean", 0.0, 0.0, "Hertz"),  # All times as floats
+        "f0_median": call(pitch, "Get quantile", 0.0, 0.0, 0.5, "Hertz"),
+        "f0_std": call(pitch, "Get standard deviation", 0.0, 0.0, "Hertz")
+    }
+
+
+@register_feature_group("formants", ["f1_mean", "f2_mean", "f3_mean"])
+def _formant_features(analysis: PraatAnalysis) -> Dict:
+    formant = analysis.formant
+    if analysis.extractor.backend == "numpy":
+        return {f"f{i}_mean": mean for i, mean in enumerate(_formant_means(formant), start=1)}
+    # Explicitly cast to float for time parameters
+    return {f"f{i}_mean": call(formant, "Get mean", i, 0.0, 0.0, "Hertz") for i in range(1, 4)}
+
+
+@register_feature_group("intensity", ["intensity_mean"])
+def _intensity_features(analysis: PraatAnalysis) -> Dict:
+    if analysis.extractor.backend == "numpy":
+        return {"intensity_mean": analysis.intensity.values.mean()}
+    return {"intensity_mean": call(analysis.intensity, "Get mean", 0, 0, "dB")}
+
+
+@register_feature_group("jitter_shimmer", ["jitter_local", "shimmer_local"])
+def _jitter_shimmer_features(analysis: PraatAnalysis) -> Dict:
+    extractor = analysis.extractor
+    point_process = analysis.point_process
+    return {
+        "jitter_local": call(point_process, "Get jitter (local)", 0, 0,
+                             extractor.period_floor, extractor.period_ceiling, extractor.max_period_factor),
+        "shimmer_local": call([analysis.sound, point_process], "Get shimmer (local)", 0, 0,
+                              extractor.period_floor, extractor.period_ceiling,
+                              extractor.max_period_factor, extractor.max_amplitude_factor),
+    }
+
+
+@register_feature_group("hnr", ["hnr_mean"])
+def _hnr_features(analysis: PraatAnalysis) -> Dict:
+    """Mean harmonics-to-noise ratio (dB) over the voiced frames"""
+    return {"hnr_mean": call(analysis.harmonicity, "Get mean", 0, 0)}
+
+
+@register_feature_group("cpp", ["cpps"])
+def _cpp_features(analysis: PraatAnalysis) -> Dict:
+    """Smoothed cepstral peak prominence (dB), searched over the pitch range of the extractor"""
+    return {"cpps": call(analysis.power_cepstrogram, "Get CPPS", "yes", 0.02, 0.0005,
+                         analysis.extractor.pitch_floor, analysis.extractor.pitch_ceiling, 0.05, "Parabolic",
+                         0.001, 0, "Straight", "Robust")}
+
+
+@register_feature_group("spectral_tilt", ["spectral_tilt"])
+def _spectral_tilt_features(analysis: PraatAnalysis) -> Dict:
+    """Energy of the 1-4 kHz band relative to the 0-1 kHz band of the long-term spectrum, in dB"""
+    return {"spectral_tilt": call(analysis.ltas, "Get slope", 0, 1000, 1000, 4000, "energy")}
+
+
 class PraatFeatureExtractor(FeatureExtractor):
-    def __init__(self, exclude_segments: bool = False, features_template: Dict = None):
+    def __init__(self, exclude_segments: bool = False, features_template: Dict = None,
+                 pitch_floor: float = 75,
+                 pitch_ceiling: float = 600,
+                 max_formants: float = 5,
+                 formant_ceiling: float = 5500,
+                 formant_window: float = 0.025,
+                 pre_emphasis: float = 50,
+                 period_floor: float = 0.0001,
+                 period_ceiling: float = 0.02,
+                 max_period_factor: float = 1.3,
+                 max_amplitude_factor: float = 1.6,
+                 backend: str = "call",
+                 pitch_engine: str = "praat_ac",
+                 keep_contours: bool = False,
+                 segment_boundaries: Optional[SegmentBoundaries] = None,
+                 audio_store: Optional[AudioStore] = None,
+                 profiler: Optional[StageProfiler] = None):
+        if backend not in ("call", "numpy"):
+            raise ValueError(f"Unknown Praat backend: {backend}")
+        if pitch_engine not in PITCH_ENGINES:
+            raise ValueError(f"Unknown pitch engine: {pitch_engine}")
         self.exclude_segments = exclude_segments
         self.feature_template = features_template
+        # Feature groups computed for each sound, those producing a column of the template
+        self.feature_groups = select_feature_groups(features_template or {})
+        self.pitch_floor = pitch_floor
+        self.pitch_ceiling = pitch_ceiling
+        self.max_formants = max_formants
+        self.formant_ceiling = formant_ceiling
+        self.formant_window = formant_window
+        self.pre_emphasis = pre_emphasis
+        self.period_floor = period_floor
+        self.period_ceiling = period_ceiling
+        self.max_period_factor = max_period_factor
+        self.max_amplitude_factor = max_amplitude_factor
+        # "call" runs Praat commands through its interpreter, "numpy" uses the typed
+        # parselmouth methods and computes the summary statistics with NumPy
+        self.backend = backend
+        self.pitch_engine = pitch_engine
+        # Also return the frame-level contours under CONTOURS_KEY, to be written to a ContourStore
+        self.keep_contours = keep_contours
+        # Also analyse the segments of each recording, sliced from the decoded samples, and return
+        # their features under SEGMENTS_KEY
+        self.segment_boundaries = segment_boundaries
+        # Decoded audio read instead of the WAV files, see _load_sound
+        self.audio_store = audio_store
+        # Times file decoding and every feature group, disabled unless a profiler is given
+        self.profiler = profiler or StageProfiler(enabled=False)
 
-    def extract_features(self, file_path: Path, label: str) -> Dict:
-        features = {
+    @property
+    def analysis_params(self) -> Dict:
+        """Parameters that determine the extracted values, used to key cached features"""
+        return {
+            "features": sorted(self.feature_template),
+            "pitch_floor": self.pitch_floor,
+            "pitch_ceiling": self.pitch_ceiling,
+            "max_formants": self.max_formants,
+            "formant_ceiling": self.formant_ceiling,
+            "formant_window": self.formant_window,
+            "pre_emphasis": self.pre_emphasis,
+            "period_floor": self.period_floor,
+            "period_ceiling": self.period_ceiling,
+            "max_period_factor": self.max_period_factor,
+            "max_amplitude_factor": self.max_amplitude_factor,
+            "backend": self.backend,
+            "pitch_engine": self.pitch_engine,
+            # Only part of the key when set, so caches written without contours stay valid
+            **({"keep_contours": True} if self.keep_contours else {}),
+            **({"segments": self.segment_boundaries.digest} if self.segment_boundaries else {}),
+            # Decoded samples are mono float32, which can differ from Praat's own decoding, and
+            # are analysed at the rate the store resampled them to
+            **({"audio_store": self.audio_store.requested_rate or "native"} if self.audio_store is not None else {}),
+        }
+
+    def empty_features(self, file_path: Path, label: str) -> Dict:
+        """Row of a file without extracted features, kept for files that fail or time out"""
+        return {
             "file": file_path.name,
             "label": label,
+            **({"segment": FULL_RECORDING} if self.segment_boundaries else {}),
             **self.feature_template.copy()
         }
+
+    def extract_features(self, file_path: Path, label: str) -> Dict:
+        features = self.empty_features(file_path, label)
         
         try:
-            sound = parselmouth.Sound(str(file_path))
+            with self.profiler.stage("praat.decode"):
+                sound = self._load_sound(file_path)
             features.update(self._extract_acoustic_features(sound))
+            if self.segment_boundaries:
+                features[SEGMENTS_KEY] = self._extract_segment_features(sound, file_path.name)
             # Check if any of the features are NaN
             if any(isinstance(val, (float, int)) and np.isnan(val) for val in features.values()):
                 logging.warning(f"NaN values found in features for {file_path.name}")
@@ -32,48 +297,48 @@ class PraatFeatureExtractor(FeatureExtractor):
             
         return features
 
-    def _extract_acoustic_features(self, sound) -> Dict:
-        features = {}
-        
-        # Pitch analysis
-        try:
-            pitch = call(sound, "To Pitch", 0.0, 75, 600)
-            features.update({
-                "f0_mean": call(pitch, "Get mean", 0.0, 0.0, "Hertz"),  # All times as floats
-                "f0_median": call(pitch, "Get quantile", 0.0, 0.0, 0.5, "Hertz"),
-                "f0_std": call(pitch, "Get standard deviation", 0.0, 0.0, "Hertz")
-            })
-        except Exception as e:
-            print(f"Pitch extraction error: {str(e)}")
-
-        # Formant analysis
-        # Corrected Formant analysis
-        try:
-            formant = call(sound, "To Formant (burg)", 0.0, 5, 5500, 0.025, 50)
-            for i in range(1, 4):
-                # Explicitly cast to float for time parameters
-                features[f"f{i}_mean"] = call(formant, "Get mean", i, 0.0, 0.0, "Hertz")
-        except Exception as e:
-            print(f"Formant extraction error: {str(e)}")
+    def _load_sound(self, file_path: Path) -> parselmouth.Sound:
+        samples = self.audio_store.get(file_path) if self.audio_store is not None else None
+        if samples is None:
+            return parselmouth.Sound(str(file_path))
+        # Praat copies the view into its own buffer, but the file is neither read nor decoded again
+        return parselmouth.Sound(samples, sampling_frequency=self.audio_store.sample_rate(file_path))
 
+    def _extract_segment_features(self, sound: parselmouth.Sound, file_name: str) -> List[Dict]:
+        """Features of every segment of a recording, analysed from views of its decoded samples"""
+        rows = []
+        segments = self.segment_boundaries.get(file_name)
+        for segment, start, samples in slice_segments(sound.values, sound.sampling_frequency, segments):
+            features = {"segment": segment, **self.feature_template.copy()}
+            try:
+                with self.profiler.stage("praat.segment"):
+                    # Praat objects own their samples, so the view is copied once into the segment Sound
+                    part = parselmouth.Sound(samples, sampling_frequency=sound.sampling_frequency, start_time=start)
+                    features.update(self._extract_acoustic_features(part))
+                # Contours are only kept for whole recordings
+                features.pop(CONTOURS_KEY, None)
+            except Exception as e:
+                logging.error(f"Error processing segment {segment} of {file_name}: {str(e)}")
+            rows.append(features)
+        return rows
 
-        # Intensity analysis
-        # Corrected Intensity analysis
-        try:
-            # Add third argument for 'subtract mean' (Praat requires 3 parameters)
-            intensity = call(sound, "To Intensity", 75, 0.0, "yes")
-            features["intensity_mean"] = call(intensity, "Get mean", 0, 0, "dB")
-        except Exception as e:
-            print(f"Intensity extraction error: {str(e)}")
+    def _extract_acoustic_features(self, sound) -> Dict:
+        features = {}
+        analysis = PraatAnalysis(sound, self)
 
-        # Jitter and shimmer analysis
-        try:
-            point_process = call(sound, "To PointProcess (periodic, cc)", 75, 600)
-            features["jitter_local"] = call(point_process, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3)
-            features["shimmer_local"] = call([sound, point_process], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
-        except Exception as e:
-            print(f"Jitter and shimmer extraction error: {str(e)}")
+        # Only the groups with a column in the features template, sharing the Praat objects of the analysis
+        for group in self.feature_groups:
+            try:
+                with self.profiler.stage(f"praat.{group.name}"):
+                    features.update(group.compute(analysis))
+            except Exception as e:
+                print(f"{group.name} extraction error: {str(e)}")
 
+        if self.keep_contours:
+            try:
+                with self.profiler.stage("praat.contours"):
+                    features[CONTOURS_KEY] = analysis.contours()
+            except Exception as e:
+                print(f"Contour extraction error: {str(e)}")
 
         return features
-
@@ -0,0 +1,26 @@
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class RowLookup:
+    """Hash index of a metadata table, to left join extracted rows one at a time.
+
+    Joining a row gives the same result as ``pd.merge(rows, df, on=key, how='left')``
+    restricted to that row: one output row per matching metadata row, in table
+    order, or a single row with NaN metadata when nothing matches.
+    """
+
+    def __init__(self, df: pd.DataFrame, key: str):
+        self.key = key
+        self.columns = [c for c in df.columns if c != key]
+        self.rows: Dict[object, List[Dict]] = defaultdict(list)
+        for record in df.to_dict('records'):
+            self.rows[record[key]].append({c: record[c] for c in self.columns})
+        self.missing = {c: np.nan for c in self.columns}
+
+    def join(self, row: Dict) -> List[Dict]:
+        matches = self.rows.get(row.get(self.key)) or [self.missing]
+        return [{**row, **match} for match in matches]
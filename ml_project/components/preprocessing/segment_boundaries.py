@@ -0,0 +1,69 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Key under which extractors return the features of the segments of a recording next to the
+# features of the whole recording. It is popped by the dataset creator, which emits one row per segment.
+SEGMENTS_KEY = "_segments"
+# Value of the segment column for the row of the whole recording
+FULL_RECORDING = "full"
+SEGMENT_COLUMNS = ("file", "segment", "start", "end")
+
+
+class SegmentBoundaries:
+    """Time boundaries of the vowel segments of each recording.
+
+    Read from a CSV with one row per segment and the columns file (name of the
+    recording, e.g. F-1_VoiceVowel.wav), segment (e.g. a, i, o), start and end
+    (seconds from the start of the recording).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        df = pd.read_csv(self.path)
+        missing = set(SEGMENT_COLUMNS) - set(df.columns)
+        if missing:
+            raise ValueError(f"Segment boundaries {self.path} lack the columns {sorted(missing)}")
+        invalid = df[df["end"] <= df["start"]]
+        if not invalid.empty:
+            raise ValueError(f"Segments ending before they start in {self.path}: {invalid.to_dict('records')}")
+        df = df.sort_values(["file", "start"], kind="stable")
+        self.segments: Dict[str, List[Tuple[str, float, float]]] = {
+            file: list(zip(group["segment"].astype(str), group["start"].astype(float), group["end"].astype(float)))
+            for file, group in df.groupby("file", sort=False)
+        }
+        # Identifies the boundaries in the keys of cached features
+        self.digest = hashlib.sha256(
+            df[list(SEGMENT_COLUMNS)].to_csv(index=False).encode()
+        ).hexdigest()
+
+    def get(self, file: str) -> List[Tuple[str, float, float]]:
+        """Segment name, start and end of every segment of a recording, in time order"""
+        return self.segments.get(file, [])
+
+
+def slice_segments(samples: np.ndarray, sample_rate: float,
+                   segments: List[Tuple[str, float, float]]) -> Iterator[Tuple[str, float, np.ndarray]]:
+    """Slice the segments of a recording out of its decoded samples
+
+    The slices are views of ``samples`` along its last axis, so no audio is
+    copied or decoded again. Boundaries beyond the end of the recording are
+    clipped to it.
+
+    Args:
+        samples (np.ndarray): Samples of the recording, time on the last axis
+        sample_rate (float): Sample rate of the recording
+        segments (List[Tuple[str, float, float]]): Segment name, start and end in seconds
+
+    Yields:
+        Tuple[str, float, np.ndarray]: Segment name, start time and samples of each non-empty segment
+    """
+    n_samples = samples.shape[-1]
+    for segment, start, end in segments:
+        first = min(max(int(round(start * sample_rate)), 0), n_samples)
+        last = min(int(round(end * sample_rate)), n_samples)
+        if last > first:
+            yield segment, first / sample_rate, samples[..., first:last]
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
 import numpy as np
 
@@ -10,6 +10,14 @@ class ModelConfig:
     param_grid: dict
     train_size: float = 0.8
     random_state: int = 0
+    search_strategy: str = "grid"  # "grid", "parallel_grid", "halving", "random" or "regularization_path"
+    cv: int = 4
+    n_jobs: int = -1  # Processes of the parallel strategies
+    n_iter: int = 10  # Budget of the random search
+    halving_factor: int = 3
+    transformer_cache_dir: Optional[Path] = None  # Directory caching fitted transformer steps. None disables caching.
+    transformer_cache_max_size_mb: int = 1024
+    transformer_cache_cleanup: bool = True  # Remove the cache when training completes
 
 @dataclass
 class PreprocessingConfig:
@@ -19,6 +27,8 @@ class PreprocessingConfig:
 class LoggingConfig:
     experiment_name: str
     tracking_uri: str
+    nested_cv_runs: bool = False  # Log every CV result row as a nested run besides the cv_results artifact
+    async_logging: bool = False  # Send tracking calls from a background queue instead of blocking training
 
 @dataclass
 class SentenceConfig:
@@ -32,6 +42,32 @@ class SentenceConfig:
     mlflow_tracking_uri: str = "file:///Users/antonellaschiavoni/Documents/Antonella/tesis-ciencia-de-datos/mlruns"
     mlflow_experiment: str = "sentence-dataset-creation"
     exclude_segments: bool = True
+    workers: int = 1  # Number of processes used to extract features. 1 keeps the serial path.
+    longest_first: bool = False  # With several workers, start the largest of the upcoming files first so long recordings do not stall the end of the run
+    time_budget_s: Optional[float] = None  # Seconds a file may take. Files over budget are stopped in their worker process, retried after the others, then kept as NaN rows with timed_out set.
+    timeout_retries: int = 1  # Retries of a timed out file, each with twice the previous budget
+    cache_dir: Optional[Path] = None  # Directory of the persistent feature cache. None disables caching.
+    cache_max_size_mb: int = 1024
+    metadata_cache_dir: Optional[Path] = None  # Directory of the parsed evaluation/participant metadata. None parses once per process.
+    incremental: bool = False  # Reuse the latest dataset in output_dir and only extract new or changed files.
+    praat_backend: str = "call"  # "call" (Praat commands) or "numpy" (typed parselmouth methods + NumPy statistics)
+    pitch_engine: str = "praat_ac"  # One of pitch_engines.PITCH_ENGINES: "pyin", "yin", "praat_ac" or "praat_cc"
+    feature_backend: str = "praat"  # "praat" (features_template) or "opensmile" (openSMILE functionals, 88 eGeMAPSv02 features by default, batched over `workers` threads)
+    opensmile_feature_set: str = "eGeMAPSv02"  # Name of an opensmile.FeatureSet
+    opensmile_batch_size: int = 256  # Files per openSMILE multi-file processing call
+    output_format: str = "csv"  # "csv" or "parquet" (float32 features, categorical label/sample_name/sex)
+    partition_cols: Optional[list] = None  # Columns to partition a Parquet dataset by, e.g. ["sex"]
+    streaming: bool = False  # Append rows to the output in batches while extracting instead of building the whole dataset in memory.
+    stream_batch_size: int = 256
+    async_logging: bool = False  # Send tracking calls from a background queue instead of blocking extraction
+    profile: bool = False  # Record per-stage and per-feature-group timings and peak memory, logged to MLflow
+    manifest_path: Optional[Path] = None  # JSON listing of the audio files in base_dir, refreshed from directory mtimes (and file stats with incremental). None walks base_dir on every run.
+    audio_store_path: Optional[Path] = None  # Decode every recording once into a memory-mapped float32 store the extractors read from. None decodes in the extractor.
+    audio_store_sample_rate: Optional[int] = None  # Rate the audio store resamples to. None keeps the rate of each file.
+    keep_contours: bool = False  # Also write the frame-level F0, F1-F3 and intensity contours to a Parquet side store in output_dir
+    contour_statistics: Optional[list] = None  # Statistics derived from the contours and added to the dataset, e.g. ["f0_p10", "f0_slope", "f0_voiced_fraction"]
+    # Output columns. Only the feature groups producing one of them are computed (see feature_groups.FEATURE_GROUPS),
+    # e.g. {"f0_mean": np.nan} alone skips formants, intensity and the PointProcess. Also available: hnr_mean, cpps, spectral_tilt
     features_template = {
         "f0_mean": np.nan,
         "f1_mean": np.nan,
@@ -51,6 +87,33 @@ class VowelConfig:
     exclude_segments: bool = True # This config is used to exclude segments to be included in the dataset. By segments, i mean the audio segment to pronounce i, a, o.
     mlflow_tracking_uri: str = "file:///Users/antonellaschiavoni/Documents/Antonella/tesis-ciencia-de-datos/mlruns"
     mlflow_experiment: str = "vowel-feature-extraction"
+    workers: int = 1  # Number of processes used to extract features. 1 keeps the serial path.
+    longest_first: bool = False  # With several workers, start the largest of the upcoming files first so long recordings do not stall the end of the run
+    time_budget_s: Optional[float] = None  # Seconds a file may take. Files over budget are stopped in their worker process, retried after the others, then kept as NaN rows with timed_out set.
+    timeout_retries: int = 1  # Retries of a timed out file, each with twice the previous budget
+    cache_dir: Optional[Path] = None  # Directory of the persistent feature cache. None disables caching.
+    cache_max_size_mb: int = 1024
+    metadata_cache_dir: Optional[Path] = None  # Directory of the parsed evaluation/participant metadata. None parses once per process.
+    incremental: bool = False  # Reuse the latest dataset in output_dir and only extract new or changed files.
+    praat_backend: str = "call"  # "call" (Praat commands) or "numpy" (typed parselmouth methods + NumPy statistics)
+    pitch_engine: str = "praat_ac"  # One of pitch_engines.PITCH_ENGINES: "pyin", "yin", "praat_ac" or "praat_cc"
+    feature_backend: str = "praat"  # "praat" (features_template) or "opensmile" (openSMILE functionals, 88 eGeMAPSv02 features by default, batched over `workers` threads)
+    opensmile_feature_set: str = "eGeMAPSv02"  # Name of an opensmile.FeatureSet
+    opensmile_batch_size: int = 256  # Files per openSMILE multi-file processing call
+    output_format: str = "csv"  # "csv" or "parquet" (float32 features, categorical label/sample_name/sex)
+    partition_cols: Optional[list] = None  # Columns to partition a Parquet dataset by, e.g. ["sex"]
+    streaming: bool = False  # Append rows to the output in batches while extracting instead of building the whole dataset in memory.
+    stream_batch_size: int = 256
+    async_logging: bool = False  # Send tracking calls from a background queue instead of blocking extraction
+    profile: bool = False  # Record per-stage and per-feature-group timings and peak memory, logged to MLflow
+    manifest_path: Optional[Path] = None  # JSON listing of the audio files in base_dir, refreshed from directory mtimes (and file stats with incremental). None walks base_dir on every run.
+    audio_store_path: Optional[Path] = None  # Decode every recording once into a memory-mapped float32 store the extractors read from. None decodes in the extractor.
+    audio_store_sample_rate: Optional[int] = None  # Rate the audio store resamples to. None keeps the rate of each file.
+    keep_contours: bool = False  # Also write the frame-level F0, F1-F3 and intensity contours to a Parquet side store in output_dir
+    contour_statistics: Optional[list] = None  # Statistics derived from the contours and added to the dataset, e.g. ["f0_p10", "f0_slope", "f0_voiced_fraction"]
+    segments_path: Optional[Path] = None  # CSV with file, segment, start, end (s) of the vowel segments. Each recording is decoded once and one row per segment is added.
+    # Output columns. Only the feature groups producing one of them are computed (see feature_groups.FEATURE_GROUPS),
+    # e.g. {"f0_mean": np.nan} alone skips formants, intensity and the PointProcess. Also available: hnr_mean, cpps, spectral_tilt
     features_template = {
         "f0_mean": np.nan,
         "f1_mean": np.nan,
@@ -1,20 +1,71 @@
+import json
+import logging
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, Optional
 import mlflow
 import pandas as pd
+from mlflow.entities import Metric, Param
+from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
+from ml_project.logging.tracking_queue import TrackingQueue, batch_chunks
 from ml_project.src.interfaces import ExperimentLogger
 from sklearn.model_selection import GridSearchCV
 
 class MLflowLogger(ExperimentLogger):
-    def __init__(self, experiment_name: str, tracking_uri: str):
+    def __init__(self, experiment_name: str, tracking_uri: str, nested_cv_runs: bool = False,
+                 async_logging: bool = False, tracking_batch_size: int = 100, max_retries: int = 3):
+        """MLflow experiment logger
+
+        Args:
+            experiment_name (str): Name of the MLflow experiment
+            tracking_uri (str): MLflow tracking URI
+            nested_cv_runs (bool): Also log every row of the CV results as a nested run. The full
+                table is always logged as a single cv_results.parquet artifact
+            async_logging (bool): Send params, metrics and artifacts from a background TrackingQueue
+                instead of blocking the caller. Runs started with start_run are flushed when they end
+            tracking_batch_size (int): Maximum number of queued calls sent together
+            max_retries (int): Retries of a failed tracking call before it is given up
+        """
         mlflow.set_tracking_uri(tracking_uri)
         mlflow.set_experiment(experiment_name)
         self.client = mlflow.tracking.MlflowClient()
+        self.nested_cv_runs = nested_cv_runs
+        self.queue = TrackingQueue(
+            self.client, batch_size=tracking_batch_size, max_retries=max_retries
+        ) if async_logging else None
+
+    @contextmanager
+    def start_run(self, **kwargs):
+        """mlflow.start_run that flushes the tracking queue before the run ends"""
+        with mlflow.start_run(**kwargs) as run:
+            try:
+                yield run
+            finally:
+                self.flush()
+
+    def flush(self):
+        """Wait until every queued tracking call has been sent"""
+        if self.queue is None:
+            return
+        self.queue.flush()
+        if self.queue.failures:
+            logging.warning(f"{len(self.queue.failures)} tracking calls failed, see the log for details")
+
+    def close(self):
+        if self.queue is not None:
+            self.queue.close()
         
-    def log_training_metadata(self, model: GridSearchCV, cv_results: pd.DataFrame):
-        with mlflow.start_run():
+    def log_training_metadata(self, model: GridSearchCV, cv_results: pd.DataFrame,
+                              search_report: Optional[Dict] = None):
+        with self.start_run():
             self._log_model(model)
             self._log_cv_results(cv_results)
             self._log_best_params(model)
+            if search_report:
+                self._log_search_report(search_report)
     
     def _log_model(self, model: GridSearchCV):
         mlflow.sklearn.log_model(
@@ -24,35 +75,125 @@ class MLflowLogger(ExperimentLogger):
         )
     
     def _log_cv_results(self, cv_results: pd.DataFrame):
-        for i, params in enumerate(cv_results['params']):
-            with mlflow.start_run(nested=True):
-                mlflow.log_params(params)
-                mlflow.log_metric("mean_test_score", cv_results['mean_test_score'][i])
-    
+        """Log the CV results table as one Parquet artifact, and optionally one nested run per row"""
+        table = cv_results.copy()
+        table['params'] = table['params'].apply(lambda params: json.dumps(params, default=str))
+        for column in table.columns:
+            if table[column].dtype == object:
+                table[column] = table[column].astype(str)
+        tmp_dir = Path(tempfile.mkdtemp())
+        table.to_parquet(tmp_dir / "cv_results.parquet", index=False)
+        self._log_artifact(self._run_id(), tmp_dir, cleanup=True)
+
+        if self.nested_cv_runs:
+            parent = mlflow.active_run()
+            score_columns = [c for c in ('mean_test_score', 'std_test_score', 'rank_test_score') if c in cv_results]
+            for i, params in enumerate(cv_results['params']):
+                metrics = {c: cv_results[c][i] for c in score_columns}
+                if self.queue is not None:
+                    self.queue.call(f"nested run {i}", self._log_nested_run, parent.info, params, metrics)
+                else:
+                    self._log_nested_run(parent.info, params, metrics)
+
+    def _log_nested_run(self, parent_info, params: Dict, metrics: Dict):
+        run = self.client.create_run(parent_info.experiment_id, tags={MLFLOW_PARENT_RUN_ID: parent_info.run_id})
+        self._send_batch(run.info.run_id, params, metrics)
+        self.client.set_terminated(run.info.run_id)
+
     def _log_best_params(self, model: GridSearchCV):
-        mlflow.log_metric("best_score", model.best_score_)
-        for param, value in model.best_params_.items():
-            mlflow.log_param(param, value)
-    
+        self._log_batch(self._run_id(), model.best_params_, {"best_score": model.best_score_})
+
+    def _log_search_report(self, search_report: Dict):
+        metrics = {k: v for k, v in search_report.items() if k not in ("search_strategy", "best_score")}
+        self._log_batch(self._run_id(), {"search_strategy": search_report["search_strategy"]}, metrics)
+
+    @staticmethod
+    def _run_id() -> str:
+        return mlflow.active_run().info.run_id
+
+    def _log_batch(self, run_id: str, params: Dict, metrics: Dict):
+        """Log params and metrics of a run in a single round trip, in the background if async"""
+        if self.queue is not None:
+            self.queue.log_batch(run_id, params, metrics)
+        else:
+            self._send_batch(run_id, params, metrics)
+
+    def _send_batch(self, run_id: str, params: Dict, metrics: Dict):
+        timestamp = int(time.time() * 1000)
+        for chunk_params, chunk_metrics in batch_chunks(
+                [Param(key, str(value)) for key, value in params.items()],
+                [Metric(key, float(value), timestamp, 0) for key, value in metrics.items()]):
+            self.client.log_batch(run_id, metrics=chunk_metrics, params=chunk_params)
+
+    def _log_artifact(self, run_id: str, local_path: Path, artifact_path: Optional[str] = None,
+                      cleanup: bool = False):
+        """Log a file, or the contents of a directory, deleting it afterwards if cleanup is set"""
+        local_path = Path(local_path)
+        if self.queue is not None:
+            self.queue.log_artifact(run_id, local_path, artifact_path, cleanup=cleanup)
+            return
+        if local_path.is_dir():
+            self.client.log_artifacts(run_id, str(local_path), artifact_path)
+        else:
+            self.client.log_artifact(run_id, str(local_path), artifact_path)
+        if cleanup:
+            shutil.rmtree(local_path) if local_path.is_dir() else local_path.unlink()
+
+    def _log_document(self, run_id: str, method: str, content, artifact_file: str):
+        """client.log_text or client.log_dict, in the background if async"""
+        fn = getattr(self.client, method)
+        if self.queue is not None:
+            self.queue.call(f"{method} {artifact_file}", fn, run_id, content, artifact_file)
+        else:
+            fn(run_id, content, artifact_file)
+
     def log_dataset(self, dataset: pd.DataFrame, dataset_name: str, 
-                   description: str = "Processed audio features dataset"):
-        """Log dataset as MLflow artifact"""
-        with mlflow.start_run(nested=True):
-            mlflow.log_text(description, f"{dataset_name}-description.txt")
-            mlflow.log_param("num_samples", len(dataset))
-            mlflow.log_param("num_features", len(dataset.columns))
-            mlflow.log_param("features_names", dataset.columns.tolist())
+                   description: str = "Processed audio features dataset",
+                   dataset_path: Optional[Path] = None):
+        """Log dataset as MLflow artifact
+
+        If dataset_path is given, the dataset already written there is logged as is
+        instead of writing a temporary Parquet copy.
+        """
+        with mlflow.start_run(nested=True) as run:
+            run_id = run.info.run_id
+            self._log_document(run_id, "log_text", description, f"{dataset_name}-description.txt")
+            self._log_batch(run_id, {
+                "num_samples": len(dataset),
+                "num_features": len(dataset.columns),
+                "features_names": dataset.columns.tolist()
+            }, {})
             
             # Log summary statistics
             stats = dataset.describe().to_dict()
-            mlflow.log_dict(stats, f"{dataset_name}-stats.json")
+            self._log_document(run_id, "log_dict", stats, f"{dataset_name}-stats.json")
             
             # Log actual dataset
-            temp_path = Path("temp") / f"{dataset_name}.parquet"
-            temp_path.parent.mkdir(exist_ok=True)
-            dataset.to_parquet(temp_path)
-            mlflow.log_artifact(temp_path)
-            temp_path.unlink()
+            if dataset_path is not None:
+                self._log_artifact(run_id, dataset_path, dataset_path.name if dataset_path.is_dir() else None)
+                return
+            tmp_dir = Path(tempfile.mkdtemp())
+            dataset.to_parquet(tmp_dir / f"{dataset_name}.parquet")
+            self._log_artifact(run_id, tmp_dir, cleanup=True)
+
+    def log_streamed_dataset(self, dataset_path: Path, dataset_name: str, num_samples: int,
+                             schema: Dict[str, str], description: str = "Processed audio features dataset"):
+        """Log a dataset written batch by batch, without loading it back into memory
+
+        Records the number of rows and the type of every column instead of the
+        summary statistics of log_dataset, and logs the written dataset as is.
+        """
+        with mlflow.start_run(nested=True) as run:
+            run_id = run.info.run_id
+            self._log_document(run_id, "log_text", description, f"{dataset_name}-description.txt")
+            self._log_batch(run_id, {
+                "num_samples": num_samples,
+                "num_features": len(schema),
+                "features_names": list(schema)
+            }, {})
+            self._log_document(run_id, "log_dict", schema, f"{dataset_name}-schema.json")
+            if dataset_path.exists():
+                self._log_artifact(run_id, dataset_path, dataset_path.name if dataset_path.is_dir() else None)
 
     def log_params(self, params):
         """Log parameters to MLflow
@@ -60,8 +201,7 @@ class MLflowLogger(ExperimentLogger):
         Args:
             params (dict): Dictionary of parameters to log
         """
-        for key, value in params.items():
-            mlflow.log_param(key, value)
+        self._log_batch(self._run_id(), params, {})
     
     def log_metrics(self, metrics):
         """Log metrics to MLflow
@@ -69,13 +209,21 @@ class MLflowLogger(ExperimentLogger):
         Args:
             metrics (dict): Dictionary of metrics to log
         """
-        for key, value in metrics.items():
-            mlflow.log_metric(key, value)
+        self._log_batch(self._run_id(), {}, metrics)
             
+    def log_dict(self, dictionary, artifact_file):
+        """Log a dictionary to MLflow as a JSON or YAML artifact
+        
+        Args:
+            dictionary (dict): Dictionary to log
+            artifact_file (str): Artifact path, e.g. "profile.json"
+        """
+        self._log_document(self._run_id(), "log_dict", dictionary, artifact_file)
+
     def log_artifact(self, local_path):
         """Log an artifact (file) to MLflow
         
         Args:
             local_path (str): Path to the file to log
         """
-        mlflow.log_artifact(local_path)
+        self._log_artifact(self._run_id(), local_path)
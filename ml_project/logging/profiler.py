@@ -0,0 +1,113 @@
+import resource
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+
+import numpy as np
+
+_DISABLED = nullcontext()
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak resident set size of the current process in MB
+
+    With ``resource.RUSAGE_CHILDREN``, the peak of the largest of its terminated
+    child processes, such as the workers of a process pool that was shut down.
+    """
+    rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024
+
+
+class StageProfiler:
+    """Wall time, calls, failures and memory growth of the stages of a run.
+
+    Code to profile is wrapped in ``with profiler.stage(name):``. Every call
+    records its duration, whether it raised, and how much it raised the peak
+    RSS, so per-file stages such as feature groups get percentiles across
+    files. The peak RSS is a high-water mark over the lifetime of the process,
+    so a call only shows growth when it uses more memory than any earlier code.
+    Worker processes are covered by the peak of the terminated children, i.e.
+    once a stage shuts its pool down. A disabled profiler returns a shared
+    no-op context and records nothing.
+
+    Profilers of worker processes are merged into the parent with ``drain``
+    and ``merge``. ``summary`` aggregates the records; ``log`` sends them to an
+    MLflowLogger as metrics and as a JSON artifact.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+        # Largest rise of the peak RSS of the process, or of its terminated children, during a call
+        self.rss_growth_mb: Dict[str, float] = defaultdict(float)
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _DISABLED
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        peaks = peak_rss_mb(), peak_rss_mb(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failures[name] += 1
+            raise
+        finally:
+            self.durations[name].append(time.perf_counter() - start)
+            growth = max(peak_rss_mb() - peaks[0], peak_rss_mb(resource.RUSAGE_CHILDREN) - peaks[1])
+            self.rss_growth_mb[name] = max(self.rss_growth_mb[name], growth)
+
+    def drain(self) -> Dict:
+        """Records collected since the last drain, to be merged into another profiler"""
+        records = {"durations": dict(self.durations), "failures": dict(self.failures),
+                   "rss_growth_mb": dict(self.rss_growth_mb)}
+        self.durations.clear()
+        self.failures.clear()
+        self.rss_growth_mb.clear()
+        return records
+
+    def merge(self, records: Dict):
+        for name, durations in records["durations"].items():
+            self.durations[name].extend(durations)
+        for name, failures in records["failures"].items():
+            self.failures[name] += failures
+        for name, growth in records["rss_growth_mb"].items():
+            self.rss_growth_mb[name] = max(self.rss_growth_mb[name], growth)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Calls, failures, total/mean/percentile wall times (s) and largest RSS growth (MB) of every stage"""
+        summary = {}
+        for name, durations in sorted(self.durations.items()):
+            values = np.array(durations)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary[name] = {
+                "calls": len(values),
+                "failures": self.failures.get(name, 0),
+                "total_s": float(values.sum()),
+                "mean_s": float(values.mean()),
+                "p50_s": float(p50),
+                "p95_s": float(p95),
+                "p99_s": float(p99),
+                "max_s": float(values.max()),
+                "rss_growth_mb": self.rss_growth_mb[name],
+            }
+        return summary
+
+    def log(self, logger, artifact_file: str = "profile.json"):
+        """Log the summary to MLflow as profile.<stage>.<statistic> metrics and as a JSON artifact"""
+        if not self.enabled or not self.durations:
+            return
+        summary = self.summary()
+        logger.log_metrics({
+            f"profile.{name}.{statistic}": value
+            for name, statistics in summary.items()
+            for statistic, value in statistics.items()
+        })
+        logger.log_dict(summary, artifact_file)
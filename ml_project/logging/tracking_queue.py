@@ -0,0 +1,155 @@
+import logging
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from mlflow.entities import Metric, Param
+from mlflow.tracking import MlflowClient
+from mlflow.utils.validation import MAX_ENTITIES_PER_BATCH, MAX_METRICS_PER_BATCH, MAX_PARAMS_TAGS_PER_BATCH
+
+
+def batch_chunks(params: List[Param], metrics: List[Metric]) -> Iterator[Tuple[List[Param], List[Metric]]]:
+    """Split params and metrics into batches within the limits of a single log_batch call
+
+    MLflow rejects batches of more than 100 params, 1000 metrics or 1000 entities in total.
+    """
+    while params or metrics:
+        chunk_params = params[:MAX_PARAMS_TAGS_PER_BATCH]
+        n_metrics = min(MAX_METRICS_PER_BATCH, MAX_ENTITIES_PER_BATCH - len(chunk_params))
+        yield chunk_params, metrics[:n_metrics]
+        params, metrics = params[len(chunk_params):], metrics[n_metrics:]
+
+
+class TrackingQueue:
+    """Sends MLflow tracking calls from a background thread so the caller never waits on the tracking store.
+
+    Params and metrics are queued per run and merged into as few ``log_batch``
+    calls as the MLflow batch limits allow; artifacts are uploaded in the order they were queued.
+    Every call is retried with exponential backoff before it is given up and
+    recorded in ``failures``. ``flush`` blocks until everything queued so far
+    has been sent, and must be called before the end of a run.
+    """
+
+    def __init__(self, client: MlflowClient, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_retries: int = 3, retry_backoff: float = 0.5):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.failures: List[Tuple[str, Exception]] = []
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="mlflow-tracking-queue", daemon=True)
+        self._worker.start()
+
+    def log_batch(self, run_id: str, params: Optional[Dict] = None, metrics: Optional[Dict] = None, step: int = 0):
+        timestamp = int(time.time() * 1000)
+        self._put(("batch", run_id, (
+            [Param(key, str(value)) for key, value in (params or {}).items()],
+            [Metric(key, float(value), timestamp, step) for key, value in (metrics or {}).items()],
+        )))
+
+    def log_artifact(self, run_id: str, local_path: Path, artifact_path: Optional[str] = None,
+                     cleanup: bool = False):
+        """Queue the upload of a file or directory; with cleanup it is deleted once uploaded"""
+        self._put(("artifact", run_id, (Path(local_path), artifact_path, cleanup)))
+
+    def call(self, description: str, fn: Callable, *args, **kwargs):
+        """Queue any other tracking call, e.g. client.log_dict"""
+        self._put(("call", description, (fn, args, kwargs)))
+
+    def flush(self):
+        """Block until every call queued so far has been sent or given up"""
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _put(self, item):
+        if self._closed:
+            raise RuntimeError("The tracking queue is closed")
+        self._queue.put(item)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if first is None:
+                self._queue.task_done()
+                return
+            items = [first]
+            while len(items) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Put the stop marker back behind the items being sent
+                    self._queue.task_done()
+                    self._queue.put(None)
+                    break
+                items.append(item)
+            try:
+                self._send(items)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _send(self, items: List):
+        pending: Dict[str, Tuple[List[Param], List[Metric]]] = {}
+        for kind, key, payload in items:
+            if kind == "batch":
+                params, metrics = pending.setdefault(key, ([], []))
+                params.extend(payload[0])
+                metrics.extend(payload[1])
+                continue
+            # Keep the order between params/metrics and the artifacts queued after them
+            self._send_batches(pending)
+            pending = {}
+            if kind == "artifact":
+                self._send_artifact(key, *payload)
+            else:
+                fn, args, kwargs = payload
+                self._retry(key, fn, *args, **kwargs)
+        self._send_batches(pending)
+
+    def _send_batches(self, pending: Dict[str, Tuple[List[Param], List[Metric]]]):
+        for run_id, (params, metrics) in pending.items():
+            for chunk_params, chunk_metrics in batch_chunks(self._unique(params), metrics):
+                self._retry(f"log_batch to run {run_id}", self.client.log_batch, run_id,
+                            metrics=chunk_metrics, params=chunk_params)
+
+    def _send_artifact(self, run_id: str, local_path: Path, artifact_path: Optional[str], cleanup: bool):
+        if local_path.is_dir():
+            self._retry(f"log_artifacts {local_path}", self.client.log_artifacts, run_id, str(local_path), artifact_path)
+        else:
+            self._retry(f"log_artifact {local_path}", self.client.log_artifact, run_id, str(local_path), artifact_path)
+        if cleanup:
+            shutil.rmtree(local_path, ignore_errors=True) if local_path.is_dir() else local_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _unique(params: List[Param]) -> List[Param]:
+        # The same param logged twice with the same value is fine for MLflow, but not twice in one batch
+        return list({param.key: param for param in params}.values())
+
+    def _retry(self, description: str, fn: Callable, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                fn(*args, **kwargs)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logging.error(f"Tracking call {description} failed after {attempt + 1} attempts: {e}")
+                    self.failures.append((description, e))
+                    return
+                logging.warning(f"Tracking call {description} failed, retrying: {e}")
+                time.sleep(self.retry_backoff * 2 ** attempt)
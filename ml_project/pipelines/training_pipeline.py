@@ -1,9 +1,10 @@
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from components.preprocessing.age_preprocessor import AgePredictionPreprocessor
-from components.models.logreg_trainer import LogisticRegressionTrainer
-from logging.mlflow_logger import MLflowLogger
-from config.params import ModelConfig, PreprocessingConfig, LoggingConfig
+from ml_project.components.preprocessing.age_preprocessor import AgePredictionPreprocessor
+from ml_project.components.models.logreg_trainer import LogisticRegressionTrainer
+from ml_project.components.models.transformer_cache import TransformerCache
+from ml_project.logging.mlflow_logger import MLflowLogger
+from ml_project.config.params import ModelConfig, PreprocessingConfig, LoggingConfig
 
 def run_pipeline(df: pd.DataFrame, 
                 model_config: ModelConfig,
@@ -17,12 +18,25 @@ def run_pipeline(df: pd.DataFrame,
     
     model_trainer = LogisticRegressionTrainer(
         pipeline_steps=model_config.pipeline_steps,
-        param_grid=model_config.param_grid
+        param_grid=model_config.param_grid,
+        search_strategy=model_config.search_strategy,
+        cv=model_config.cv,
+        n_jobs=model_config.n_jobs,
+        n_iter=model_config.n_iter,
+        halving_factor=model_config.halving_factor,
+        random_state=model_config.random_state,
+        transformer_cache=TransformerCache(
+            model_config.transformer_cache_dir,
+            max_size_mb=model_config.transformer_cache_max_size_mb,
+            cleanup=model_config.transformer_cache_cleanup
+        ) if model_config.transformer_cache_dir else None
     )
     
     logger = MLflowLogger(
         experiment_name=logging_config.experiment_name,
-        tracking_uri=logging_config.tracking_uri
+        tracking_uri=logging_config.tracking_uri,
+        nested_cv_runs=logging_config.nested_cv_runs,
+        async_logging=logging_config.async_logging
     )
 
     # Execute pipeline
@@ -36,4 +50,6 @@ def run_pipeline(df: pd.DataFrame,
     )
     
     trained_model = model_trainer.train(X_train, y_train)
-    logger.log_training_metadata(trained_model, pd.DataFrame(trained_model.cv_results_))
+    logger.log_training_metadata(trained_model, pd.DataFrame(trained_model.cv_results_),
+                                 search_report=model_trainer.search_report)
+    logger.close()
@@ -1,52 +1,208 @@
-import mlflow
+from contextlib import contextmanager
+from pathlib import Path
 import pandas as pd
+from ml_project.components.preprocessing.audio_store import AudioStore
+from ml_project.components.preprocessing.contour_statistics import aggregate_contours, parse_statistic
+from ml_project.components.preprocessing.contour_store import ContourStore, ContourStoreWriter
+from ml_project.components.preprocessing.corpus_manifest import CorpusManifest
+from ml_project.components.preprocessing.dataset_io import (
+    StreamingDatasetWriter, dataset_output_path, load_latest_dataset, save_dataset, save_file_state
+)
+from ml_project.components.preprocessing.feature_cache import FeatureCache
+from ml_project.components.preprocessing.opensmile_feature_extractor import OpenSmileFeatureExtractor
+from ml_project.components.preprocessing.participant_metadata import ParticipantMetadata
 from ml_project.components.preprocessing.praat_feature_extractor import PraatFeatureExtractor
+from ml_project.components.preprocessing.segment_boundaries import SegmentBoundaries
 from ml_project.components.preprocessing.vowel_dataset_creator import VowelDatasetCreator
 
 from ml_project.config.params import VowelConfig
-from typing import Optional
+from typing import Iterator, Optional
 
 from ml_project.logging.mlflow_logger import MLflowLogger
+from ml_project.logging.profiler import StageProfiler
 
 class VowelFeaturePipeline:
     def __init__(self, config: VowelConfig, logger: Optional[MLflowLogger] = None):
+        if config.streaming and config.incremental:
+            raise ValueError("Streaming and incremental dataset creation cannot be combined")
+        if config.keep_contours and config.incremental:
+            raise ValueError("Contours are not kept for the unchanged files of an incremental rebuild")
+        if config.contour_statistics:
+            if not config.keep_contours or config.streaming:
+                raise ValueError("Contour statistics require keep_contours and a non-streaming run")
+            for statistic in config.contour_statistics:
+                parse_statistic(statistic)
+            if config.segments_path:
+                raise ValueError("Contour statistics are per recording and cannot be added to segment rows")
+        if config.feature_backend not in ("praat", "opensmile"):
+            raise ValueError(f"Unknown feature backend: {config.feature_backend}")
+        if config.feature_backend == "opensmile" and (config.keep_contours or config.segments_path):
+            raise ValueError("Contours and segments are only extracted by the Praat feature backend")
         self.config = config
+        self.output_path: Optional[Path] = None
         self.logger = logger or MLflowLogger(
             config.mlflow_tracking_uri,
-            config.mlflow_experiment
+            config.mlflow_experiment,
+            async_logging=config.async_logging
         )
-        self.feature_extractor = PraatFeatureExtractor(
-            exclude_segments=config.exclude_segments,
-            features_template=config.features_template
+        self.profiler = StageProfiler(enabled=config.profile)
+        # Shared by the extractor, which reads from it, and the dataset creator, which fills it
+        self.audio_store = AudioStore(
+            config.audio_store_path,
+            config.audio_store_sample_rate
+        ) if config.audio_store_path else None
+        self.feature_extractor = self._feature_extractor()
+        self.cache = FeatureCache(
+            config.cache_dir,
+            max_size_bytes=config.cache_max_size_mb * 1024 ** 2
+        ) if config.cache_dir else None
+        # The recordings are in one folder per participant under base_dir
+        self.manifest = CorpusManifest(config.manifest_path, depth=1, stat_files=config.incremental) if config.manifest_path else None
+        self.metadata = ParticipantMetadata(
+            config.eval_path,
+            config.participant_path,
+            cache_dir=config.metadata_cache_dir
         )
         self.dataset_creator = VowelDatasetCreator(
             feature_extractor=self.feature_extractor,
             eval_path=config.eval_path,
             participant_path=config.participant_path,
-            output_dir=config.output_dir
+            output_dir=config.output_dir,
+            workers=config.workers,
+            cache=self.cache,
+            metadata=self.metadata,
+            profiler=self.profiler,
+            manifest=self.manifest,
+            audio_store=self.audio_store,
+            longest_first=config.longest_first,
+            time_budget=config.time_budget_s,
+            timeout_retries=config.timeout_retries
         )
 
-    def run(self) -> pd.DataFrame:
-        with mlflow.start_run():
-            df = self.dataset_creator.create_dataset(self.config.base_dir)
-            
+    def _feature_extractor(self):
+        if self.config.feature_backend == "opensmile":
+            return OpenSmileFeatureExtractor(
+                exclude_segments=self.config.exclude_segments,
+                feature_set=self.config.opensmile_feature_set,
+                num_workers=self.config.workers,
+                batch_size=self.config.opensmile_batch_size,
+                audio_store=self.audio_store,
+                profiler=self.profiler
+            )
+        return PraatFeatureExtractor(
+            exclude_segments=self.config.exclude_segments,
+            features_template=self.config.features_template,
+            backend=self.config.praat_backend,
+            pitch_engine=self.config.pitch_engine,
+            keep_contours=self.config.keep_contours,
+            audio_store=self.audio_store,
+            segment_boundaries=SegmentBoundaries(self.config.segments_path) if self.config.segments_path else None,
+            profiler=self.profiler
+        )
+
+    def run(self) -> Optional[pd.DataFrame]:
+        """Build, save and log the dataset
+
+        Returns:
+            Optional[pd.DataFrame]: The dataset, or None when streaming, which never holds the whole
+                dataset in memory. Its path is then in self.output_path.
+        """
+        writer = None
+        with self.logger.start_run():
+            if self.config.streaming:
+                with self.profiler.stage("pipeline.stream_dataset"), self._contour_store():
+                    writer = self._stream_dataset()
+                output_path, df = writer.output_path, None
+            else:
+                previous = load_latest_dataset(self.config.output_dir, "vowel_features",
+                                               self.dataset_creator.extraction_params) if self.config.incremental else None
+                with self.profiler.stage("pipeline.create_dataset"):
+                    with self._contour_store() as contour_path:
+                        if previous is not None:
+                            df = self.dataset_creator.update_dataset(self.config.base_dir, *previous)
+                        else:
+                            df = self.dataset_creator.create_dataset(self.config.base_dir)
+                    if self.config.contour_statistics:
+                        df = self._add_contour_statistics(df, contour_path)
+                with self.profiler.stage("pipeline.save_dataset"):
+                    output_path = self._save_dataset(df)
+
             if self.logger:
-                self._log_metadata(df)
-                
-            self._save_dataset(df)
+                with self.profiler.stage("pipeline.log_metadata"):
+                    self._log_metadata(df, output_path, writer)
+            if self.cache:
+                self.logger.log_metrics(self.cache.stats())
+            if self.manifest:
+                self.logger.log_metrics(self.manifest.stats())
+            extraction_stats = self.dataset_creator.executor.stats()
+            if extraction_stats:
+                self.logger.log_metrics(extraction_stats)
+            self.profiler.log(self.logger)
+            self.output_path = output_path
             return df
 
-    def _log_metadata(self, df: pd.DataFrame):
-        self.logger.log_dataset(df, "vowel_features")
-        mlflow.log_params({
+    def _log_metadata(self, df: Optional[pd.DataFrame], output_path: Path,
+                      writer: Optional[StreamingDatasetWriter] = None):
+        if df is None:
+            self.logger.log_streamed_dataset(output_path, "vowel_features", writer.rows_written, writer.schema_summary())
+        else:
+            self.logger.log_dataset(df, "vowel_features", dataset_path=output_path)
+        self.logger.log_params({
             "exclude_segments": self.config.exclude_segments,
+            "workers": self.config.workers,
+            "longest_first": self.config.longest_first,
+            "time_budget_s": self.config.time_budget_s,
+            "timeout_retries": self.config.timeout_retries,
+            "incremental": self.config.incremental,
+            "feature_backend": self.config.feature_backend,
+            "pitch_engine": self.config.pitch_engine,
+            "output_format": self.config.output_format,
+            "streaming": self.config.streaming,
+            "profile": self.config.profile,
+            "keep_contours": self.config.keep_contours,
+            "audio_store_path": str(self.config.audio_store_path) if self.config.audio_store_path else None,
+            "audio_store_sample_rate": self.config.audio_store_sample_rate,
+            "contour_statistics": self.config.contour_statistics,
+            "segments_path": str(self.config.segments_path) if self.config.segments_path else None,
             "input_dir": str(self.config.base_dir),
             "output_dir": str(self.config.output_dir)
         })
 
-    def _save_dataset(self, df: pd.DataFrame):
-        self.config.output_dir.mkdir(parents=True, exist_ok=True)
-        timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
-        output_path = self.config.output_dir / f"vowel_features_{timestamp}.csv"
-        mlflow.log_param("output_path", str(output_path))
-        df.to_csv(output_path, index=False)
+    @contextmanager
+    def _contour_store(self) -> Iterator[Optional[Path]]:
+        """Write the contours of the files extracted inside the block to a new side store"""
+        if not self.config.keep_contours:
+            yield None
+            return
+        contour_path = dataset_output_path(self.config.output_dir, "vowel_contours", "parquet")
+        with ContourStoreWriter(contour_path) as writer:
+            self.dataset_creator.contour_writer = writer
+            try:
+                yield contour_path
+            finally:
+                self.dataset_creator.contour_writer = None
+        self.logger.log_params({"contour_store_path": str(contour_path)})
+
+    def _add_contour_statistics(self, df: pd.DataFrame, contour_path: Path) -> pd.DataFrame:
+        statistics = aggregate_contours(ContourStore(contour_path), self.config.contour_statistics)
+        # A configured statistic replaces the extracted feature of the same name, e.g. f0_mean
+        df = df.drop(columns=[c for c in self.config.contour_statistics if c in df.columns])
+        return df.merge(statistics, on="file", how="left")
+
+    def _save_dataset(self, df: pd.DataFrame) -> Path:
+        output_path = save_dataset(df, self.config.output_dir, "vowel_features", self.dataset_creator.files,
+                                   output_format=self.config.output_format,
+                                   partition_cols=self.config.partition_cols,
+                                   params=self.dataset_creator.extraction_params)
+        self.logger.log_params({"output_path": str(output_path)})
+        return output_path
+
+    def _stream_dataset(self) -> StreamingDatasetWriter:
+        output_path = dataset_output_path(self.config.output_dir, "vowel_features", self.config.output_format)
+        self.logger.log_params({"output_path": str(output_path)})
+        writer = StreamingDatasetWriter(output_path, self.config.output_format,
+                                        batch_size=self.config.stream_batch_size,
+                                        partition_cols=self.config.partition_cols)
+        self.dataset_creator.stream_dataset(self.config.base_dir, writer)
+        save_file_state(output_path, self.dataset_creator.files, self.dataset_creator.extraction_params)
+        return writer
@@ -0,0 +1,70 @@
+"""
+Benchmark the extraction and training stages on a synthetic corpus.
+
+A reproducible corpus of synthetic vowel and sentence recordings, with matching evaluation and
+participant CSVs, is generated in --corpus-dir (and reused while its parameters do not change).
+Each stage runs --repeat times in a fresh process, and its throughput (files or samples per second,
+median over repetitions) and peak RSS are printed.
+
+With --baseline, the results are compared with a baseline written earlier by --save-baseline on
+the same machine and corpus, and the script exits with status 1 if a stage is slower or uses more
+memory than the baseline by more than --threshold. Baselines are machine specific, keep them out
+of the repository.
+
+Usage:
+    python ml_project/scripts/run_benchmarks.py [--n-speakers 20] [--stages praat_vowels training]
+        [--save-baseline baseline.json | --baseline baseline.json --threshold 0.2]
+"""
+
+import argparse
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from pathlib import Path
+from ml_project.benchmarks.suite import STAGES, compare_to_baseline, load_baseline, run_benchmarks, save_baseline
+from ml_project.benchmarks.synthetic_corpus import CorpusConfig, generate_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-dir", type=Path, default=Path("benchmark_corpus"))
+    parser.add_argument("--n-speakers", type=int, default=CorpusConfig.n_speakers)
+    parser.add_argument("--vowel-duration", type=float, default=CorpusConfig.vowel_duration)
+    parser.add_argument("--sentence-duration", type=float, default=CorpusConfig.sentence_duration)
+    parser.add_argument("--sample-rate", type=int, default=CorpusConfig.sample_rate)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, help="Baseline to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Tolerated relative regression")
+    parser.add_argument("--save-baseline", type=Path, help="Write the results as a new baseline")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    corpus = generate_corpus(args.corpus_dir, CorpusConfig(
+        n_speakers=args.n_speakers,
+        vowel_duration=args.vowel_duration,
+        sentence_duration=args.sentence_duration,
+        sample_rate=args.sample_rate
+    ))
+    results = run_benchmarks(corpus, args.stages, args.repeat)
+
+    print(f"{'stage':<20}{'items':>8}{'wall time (s)':>16}{'items/s':>10}{'peak RSS (MB)':>16}")
+    for stage, result in results["stages"].items():
+        print(f"{stage:<20}{result['items']:>8}{result['wall_time_s']:>16.2f}"
+              f"{result['items_per_s']:>10.2f}{result['peak_rss_mb']:>16.0f}")
+
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare_to_baseline(results, load_baseline(args.baseline), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
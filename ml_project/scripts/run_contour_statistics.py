@@ -0,0 +1,38 @@
+"""
+Derive summary statistics from a contour store without re-running the acoustic analysis.
+
+The store is the <prefix>_contours_<timestamp>.parquet file written next to a dataset by a pipeline
+run with keep_contours. The statistics (e.g. f0_p10 f0_slope f1_range intensity_std) are computed
+for every file at once and written to output_path as a CSV with a "file" column, ready to be merged
+into the dataset.
+
+Usage:
+    python ml_project/scripts/run_contour_statistics.py <store_path> <output_path> --statistics f0_p10 f0_slope
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from pathlib import Path
+from ml_project.components.preprocessing.contour_statistics import aggregate_contours
+from ml_project.components.preprocessing.contour_store import ContourStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("store_path", type=Path)
+    parser.add_argument("output_path", type=Path)
+    parser.add_argument("--statistics", nargs="+", required=True,
+                        help="<contour>_<statistic>, e.g. f0_p90 f0_voiced_fraction intensity_slope")
+    args = parser.parse_args()
+
+    store = ContourStore(args.store_path)
+    statistics = aggregate_contours(store, args.statistics)
+    args.output_path.parent.mkdir(parents=True, exist_ok=True)
+    statistics.to_csv(args.output_path, index=False)
+    print(f"Computed {len(args.statistics)} statistics for {len(store)} files, written to {args.output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Compare the pitch engines available to the feature extractors.
+
+Every engine is run on each audio file of audio_dir. The report stores, per file and engine, the runtime
+and the deviation of the F0 contour from the reference engine. It is written to output_path and a
+per-engine summary is printed, to pick a cheap engine for exploratory sweeps and check how far it is
+from the one used for final datasets.
+
+Usage:
+    python ml_project/scripts/run_pitch_engine_comparison.py <audio_dir> <output_path> [--reference pyin]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from pathlib import Path
+from ml_project.components.preprocessing.pitch_engines import PITCH_ENGINES, compare_pitch_engines
+
+
+def run_pitch_engine_comparison(audio_dir: Path, output_path: Path, reference: str, sample_rate: int):
+    files = sorted(audio_dir.rglob("*.wav"))
+    report = compare_pitch_engines(files, PITCH_ENGINES, reference=reference, sample_rate=sample_rate)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(output_path, index=False)
+
+    summary = report.groupby("engine")[
+        ["runtime_s", "voiced_fraction", "f0_mean_deviation_hz", "f0_median_deviation_cents", "gross_error_rate"]
+    ].mean().sort_values("runtime_s")
+    print(f"Compared {len(PITCH_ENGINES)} pitch engines on {len(files)} files against {reference}")
+    print(summary.to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_dir", type=Path)
+    parser.add_argument("output_path", type=Path)
+    parser.add_argument("--reference", choices=PITCH_ENGINES, default="pyin")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    args = parser.parse_args()
+    run_pitch_engine_comparison(args.audio_dir, args.output_path, args.reference, args.sample_rate)
@@ -0,0 +1,47 @@
+"""
+Check that the "numpy" backend of PraatFeatureExtractor reproduces the features of the "call" backend.
+
+Both backends build the same Praat objects; they only differ in how the summary statistics are
+computed (Praat's command interpreter vs NumPy). Praat accumulates sums in extended precision, so
+values are compared with a relative tolerance at the level of floating point rounding.
+
+Usage:
+    python tools/check_praat_backend_parity.py <audio_dir> [--rtol 1e-9]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from ml_project.components.preprocessing.praat_feature_extractor import PraatFeatureExtractor
+from ml_project.config.params import VowelConfig
+
+
+def check_parity(audio_dir: Path, rtol: float) -> int:
+    call_extractor = PraatFeatureExtractor(features_template=VowelConfig.features_template, backend="call")
+    numpy_extractor = PraatFeatureExtractor(features_template=VowelConfig.features_template, backend="numpy")
+
+    mismatches = 0
+    files = sorted(audio_dir.rglob("*.wav"))
+    for file in files:
+        expected = call_extractor.extract_features(file, label=file.stem)
+        actual = numpy_extractor.extract_features(file, label=file.stem)
+        for key, value in expected.items():
+            if key in ("file", "label"):
+                continue
+            if not np.isclose(actual.get(key, np.nan), value, rtol=rtol, atol=0.0, equal_nan=True):
+                mismatches += 1
+                print(f"{file.name}: {key} call={value} numpy={actual.get(key)}")
+
+    print(f"Checked {len(files)} files, {mismatches} mismatching values")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_dir", type=Path)
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    args = parser.parse_args()
+    sys.exit(1 if check_parity(args.audio_dir, args.rtol) else 0)
@@ -0,0 +1,263 @@
+"""
+Compare two datasets written by the dataset creation pipelines and report the cells that differ.
+
+Rows are aligned by key (file, falling back to sample_name) rather than by position, so reordered
+rows are not reported as differences, and numeric columns are compared with a tolerance, so float
+formatting is not either. Both datasets are streamed in chunks and spilled into hash buckets of the
+key, so only one bucket of each dataset is in memory at a time. Buckets whose content hashes match
+on both sides are skipped without comparing their cells.
+
+CSV and Parquet datasets (single files or partitioned directories) are supported. Parquet datasets
+store features as float32, so compare them with CSV datasets using --rtol 1e-6. The summary is
+printed as JSON and optionally written to --output. The exit code is 0 if the datasets match.
+
+Usage:
+    python tools/diff_datasets.py <old> <new> [--key file] [--rtol 1e-9] [--atol 0]
+        [--tolerance f0_mean=1e-6 ...] [--chunksize 100000] [--buckets 64] [--max-cells 100]
+        [--output summary.json]
+"""
+import argparse
+import json
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+OCCURRENCE = "__occurrence"
+DEFAULT_KEYS = ("file", "sample_name")
+
+
+def read_chunks(path: Path, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Stream a CSV or Parquet dataset in chunks of at most chunksize rows"""
+    if path.suffix == ".parquet" or path.is_dir():
+        for batch in ds.dataset(path, format="parquet", partitioning="hive").to_batches(batch_size=chunksize):
+            yield _normalize(batch.to_pandas())
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            yield _normalize(chunk)
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    # Categorical (dictionary encoded) columns compare as their values
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    return df
+
+
+def _bucket_of(df: pd.DataFrame, keys: List[str], n_buckets: int) -> np.ndarray:
+    key_values = df[keys].astype(str)
+    return (pd.util.hash_pandas_object(key_values, index=False).to_numpy() % n_buckets).astype(int)
+
+
+def spill_to_buckets(path: Path, keys: List[str], chunksize: int, n_buckets: int,
+                     spill_dir: Path) -> Tuple[List[str], int, Dict[int, List[Path]]]:
+    """Split a dataset into hash buckets of its key, written to spill_dir
+
+    Returns:
+        Tuple[List[str], int, Dict[int, List[Path]]]: Columns, number of rows and the files of each bucket
+    """
+    columns, n_rows = None, 0
+    buckets: Dict[int, List[Path]] = defaultdict(list)
+    for i, chunk in enumerate(read_chunks(path, chunksize)):
+        if columns is None:
+            columns = list(chunk.columns)
+            missing = [key for key in keys if key not in columns]
+            if missing:
+                raise ValueError(f"{path} has no key column {missing}")
+        n_rows += len(chunk)
+        bucket_ids = _bucket_of(chunk, keys, n_buckets)
+        for bucket, part in chunk.groupby(bucket_ids, sort=False):
+            part_path = spill_dir / f"{bucket}-{i}.pkl"
+            part.to_pickle(part_path)
+            buckets[bucket].append(part_path)
+    return columns or [], n_rows, buckets
+
+
+def load_bucket(parts: List[Path], keys: List[str]) -> pd.DataFrame:
+    """Load a bucket indexed by its key, numbering repeated keys in file order"""
+    if not parts:
+        return pd.DataFrame()
+    df = pd.concat([pd.read_pickle(part) for part in sorted(parts, key=lambda p: int(p.stem.split("-")[1]))],
+                   ignore_index=True)
+    df[OCCURRENCE] = df.groupby(keys, sort=False, dropna=False).cumcount()
+    return df.set_index(keys + [OCCURRENCE])
+
+
+def content_hash(df: pd.DataFrame, columns: List[str]) -> int:
+    """Order independent hash of the rows of a bucket"""
+    if df.empty:
+        return 0
+    row_hashes = pd.util.hash_pandas_object(df[columns].reset_index(), index=False).to_numpy()
+    return int(row_hashes.sum(dtype=np.uint64))
+
+
+def compare_bucket(old: pd.DataFrame, new: pd.DataFrame, columns: List[str], rtol: float, atol: float,
+                   column_tolerances: Dict[str, float]) -> Tuple[pd.Index, pd.Index, Dict[str, pd.DataFrame]]:
+    """Compare the rows of a bucket present on both sides, column by column
+
+    Returns:
+        Tuple[pd.Index, pd.Index, Dict[str, pd.DataFrame]]: Keys only in old, keys only in new and,
+            for every column with differences, the differing keys with their old and new values
+    """
+    if old.empty or new.empty:
+        return old.index, new.index, {}
+    only_old = old.index.difference(new.index)
+    only_new = new.index.difference(old.index)
+    common = old.index.intersection(new.index)
+    old, new = old.loc[common], new.loc[common]
+
+    diffs = {}
+    for column in columns:
+        a, b = old[column], new[column]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b) \
+                and not pd.api.types.is_bool_dtype(a) and not pd.api.types.is_bool_dtype(b):
+            equal = np.isclose(a.to_numpy(dtype=float), b.to_numpy(dtype=float),
+                               rtol=column_tolerances.get(column, rtol), atol=atol, equal_nan=True)
+        else:
+            equal = ((a == b) | (a.isna() & b.isna())).to_numpy()
+        if not equal.all():
+            diffs[column] = pd.DataFrame({"old": a[~equal], "new": b[~equal]})
+    return only_old, only_new, diffs
+
+
+def diff_datasets(old_path: Path, new_path: Path, keys: Optional[List[str]] = None, rtol: float = 1e-9,
+                  atol: float = 0.0, column_tolerances: Optional[Dict[str, float]] = None,
+                  chunksize: int = 100_000, n_buckets: int = 64, max_cells: int = 100) -> Dict:
+    """Diff two datasets aligned by key
+
+    Args:
+        old_path (Path): Reference dataset
+        new_path (Path): Dataset compared with the reference
+        keys (Optional[List[str]]): Key columns, by default file or else sample_name
+        rtol (float): Relative tolerance of numeric columns
+        atol (float): Absolute tolerance of numeric columns
+        column_tolerances (Optional[Dict[str, float]]): Relative tolerance overrides per column
+        chunksize (int): Rows read at a time
+        n_buckets (int): Number of hash buckets the datasets are split into
+        max_cells (int): Maximum number of differing cells listed in the summary
+
+    Returns:
+        Dict: Summary of the differences
+    """
+    column_tolerances = column_tolerances or {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        old_dir, new_dir = Path(tmp_dir) / "old", Path(tmp_dir) / "new"
+        old_dir.mkdir()
+        new_dir.mkdir()
+        if keys is None:
+            header = next(read_chunks(old_path, 1)).columns
+            keys = [next((key for key in DEFAULT_KEYS if key in header), header[0])]
+        old_columns, old_rows, old_buckets = spill_to_buckets(old_path, keys, chunksize, n_buckets, old_dir)
+        new_columns, new_rows, new_buckets = spill_to_buckets(new_path, keys, chunksize, n_buckets, new_dir)
+
+        compared = [c for c in old_columns if c in new_columns and c not in keys]
+        summary = {
+            "keys": keys,
+            "rows_old": old_rows,
+            "rows_new": new_rows,
+            "columns_only_in_old": [c for c in old_columns if c not in new_columns],
+            "columns_only_in_new": [c for c in new_columns if c not in old_columns],
+            "rows_only_in_old": 0,
+            "rows_only_in_new": 0,
+            "keys_only_in_old": [],
+            "keys_only_in_new": [],
+            "differing_cells": 0,
+            "differing_cells_by_column": {},
+            "max_abs_diff_by_column": {},
+            "cells": [],
+            "buckets": 0,
+            "buckets_skipped_by_hash": 0,
+        }
+
+        for bucket in sorted(set(old_buckets) | set(new_buckets)):
+            summary["buckets"] += 1
+            old = load_bucket(old_buckets.get(bucket, []), keys)
+            new = load_bucket(new_buckets.get(bucket, []), keys)
+            if not old.empty and not new.empty and content_hash(old, compared) == content_hash(new, compared):
+                summary["buckets_skipped_by_hash"] += 1
+                continue
+            only_old, only_new, diffs = compare_bucket(
+                old.reindex(columns=compared), new.reindex(columns=compared), compared, rtol, atol, column_tolerances
+            )
+            _add_to_summary(summary, only_old, only_new, diffs, max_cells)
+
+    summary["identical"] = not (summary["columns_only_in_old"] or summary["columns_only_in_new"]
+                                or summary["rows_only_in_old"] or summary["rows_only_in_new"]
+                                or summary["differing_cells"])
+    return summary
+
+
+def _add_to_summary(summary: Dict, only_old: pd.Index, only_new: pd.Index, diffs: Dict[str, pd.DataFrame],
+                    max_cells: int):
+    summary["rows_only_in_old"] += len(only_old)
+    summary["rows_only_in_new"] += len(only_new)
+    summary["keys_only_in_old"].extend(_key_values(only_old[:max_cells - len(summary["keys_only_in_old"])]))
+    summary["keys_only_in_new"].extend(_key_values(only_new[:max_cells - len(summary["keys_only_in_new"])]))
+    for column, diff in diffs.items():
+        by_column = summary["differing_cells_by_column"]
+        by_column[column] = by_column.get(column, 0) + len(diff)
+        summary["differing_cells"] += len(diff)
+        if pd.api.types.is_numeric_dtype(diff["old"]) and pd.api.types.is_numeric_dtype(diff["new"]):
+            max_diff = float(np.nanmax(np.abs(diff["new"].to_numpy(float) - diff["old"].to_numpy(float)),
+                                       initial=0.0))
+            previous = summary["max_abs_diff_by_column"].get(column, 0.0)
+            summary["max_abs_diff_by_column"][column] = max(previous, max_diff)
+        listed = diff.head(max(max_cells - len(summary["cells"]), 0))
+        for key, old, new in zip(_key_values(listed.index), listed["old"], listed["new"]):
+            summary["cells"].append({"key": key, "column": column, "old": _json_value(old), "new": _json_value(new)})
+
+
+def _key_values(index: pd.Index) -> List[Dict]:
+    """Key columns of each row, with the occurrence number for the repeats of a key"""
+    values = []
+    for key in index:
+        value = {name: _json_value(v) for name, v in zip(index.names[:-1], key[:-1])}
+        if key[-1]:
+            value["occurrence"] = int(key[-1])
+        values.append(value)
+    return values
+
+
+def _json_value(value):
+    if pd.isna(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _parse_tolerances(values: List[str]) -> Dict[str, float]:
+    tolerances = {}
+    for value in values:
+        column, _, rtol = value.partition("=")
+        tolerances[column] = float(rtol)
+    return tolerances
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--key", action="append", help="Key column, may be repeated")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--atol", type=float, default=0.0)
+    parser.add_argument("--tolerance", action="append", default=[], metavar="COLUMN=RTOL",
+                        help="Relative tolerance of one column")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--buckets", type=int, default=64)
+    parser.add_argument("--max-cells", type=int, default=100)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    result = diff_datasets(args.old, args.new, keys=args.key, rtol=args.rtol, atol=args.atol,
+                           column_tolerances=_parse_tolerances(args.tolerance), chunksize=args.chunksize,
+                           n_buckets=args.buckets, max_cells=args.max_cells)
+    report = json.dumps(result, indent=2, default=str)
+    if args.output:
+        args.output.write_text(report)
+    print(report)
+    sys.exit(0 if result["identical"] else 1)